@@ -0,0 +1,59 @@
+"""Admission control and drain state for realtime sessions in this process.
+
+Each worker process caps how many /ws/realtime sessions it serves at once;
+a client over the limit gets an error event and close code 1013 (try again
+later) before any Gemini session is opened for it. Once the process starts
+draining for a shutdown or redeploy (see serve.py), new sessions are turned
+away with close code 1012 (service restart) and the open ones are wound down
+as their conversations go quiet.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+# WebSocket close codes (RFC 6455)
+CLOSE_NORMAL = 1000
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_SERVICE_RESTART = 1012
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+@dataclass(frozen=True)
+class Rejection:
+    """Why a session was not admitted, as sent to the client"""
+    reason: str
+    message: str
+    close_code: int
+
+
+DRAINING = Rejection("draining", "Server is restarting, please reconnect", CLOSE_SERVICE_RESTART)
+AT_CAPACITY = Rejection("capacity", "Server is at capacity, please try again shortly", CLOSE_TRY_AGAIN_LATER)
+
+
+class SessionGate:
+    """Counts the sessions of this worker and decides whether to take more"""
+
+    def __init__(self, max_sessions: int = 0):
+        self.max_sessions = max_sessions  # 0 for no limit
+        self.active = 0
+        self.draining = False
+
+    def admit(self) -> Optional[Rejection]:
+        """Reserve a slot for a new session, or say why there is none"""
+        if self.draining:
+            return DRAINING
+        if self.max_sessions and self.active >= self.max_sessions:
+            return AT_CAPACITY
+        self.active += 1
+        return None
+
+    def release(self) -> None:
+        self.active -= 1
+
+    def drain(self) -> None:
+        """Stop admitting sessions; open ones end once they are quiet"""
+        self.draining = True
+
+
+# Gate for the sessions of this process
+gate = SessionGate()
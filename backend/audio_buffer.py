@@ -0,0 +1,83 @@
+"""Output audio buffering between Gemini and the browser.
+
+Gemini streams many small PCM16 chunks. Sending each one as its own WebSocket
+message is wasteful, so chunks are collected in a preallocated buffer and
+flushed when either enough samples are queued or the oldest queued sample has
+waited for the target latency.
+"""
+import time
+from typing import Optional
+
+BYTES_PER_SAMPLE = 2  # PCM16
+
+
+class OutputAudioBuffer:
+    """Accumulates raw PCM16 audio in a reusable bytearray"""
+
+    def __init__(self, frame_samples: int, target_latency_ms: int, sample_rate: int = 24000):
+        self.sample_rate = sample_rate
+        self._buffer = bytearray()
+        self._view = memoryview(self._buffer)
+        self._length = 0
+        self._first_write_at: Optional[float] = None
+        self.configure(frame_samples, target_latency_ms)
+
+    def configure(self, frame_samples: int, target_latency_ms: int) -> None:
+        """Change the flush threshold and latency target"""
+        self.frame_samples = frame_samples
+        self.target_latency = target_latency_ms / 1000
+        # Room for a full frame plus one oversized chunk before growing
+        self._reserve(frame_samples * BYTES_PER_SAMPLE * 2)
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self._buffer):
+            return
+        grown = bytearray(capacity)
+        grown[:self._length] = self._view[:self._length]
+        self._view.release()
+        self._buffer = grown
+        self._view = memoryview(grown)
+
+    def write(self, data: bytes) -> None:
+        """Append a chunk of PCM16 audio"""
+        if not data:
+            # An empty chunk must not start the latency deadline
+            return
+        end = self._length + len(data)
+        if end > len(self._buffer):
+            self._reserve(max(end, len(self._buffer) * 2))
+        self._view[self._length:end] = data
+        if self._length == 0:
+            self._first_write_at = time.monotonic()
+        self._length = end
+
+    @property
+    def samples(self) -> int:
+        return self._length // BYTES_PER_SAMPLE
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def is_full(self) -> bool:
+        return self.samples >= self.frame_samples
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """time.monotonic() by which buffered audio should be flushed"""
+        if self._first_write_at is None:
+            return None
+        return self._first_write_at + self.target_latency
+
+    def take(self) -> bytes:
+        """Return the buffered audio and empty the buffer"""
+        data = bytes(self._view[:self._length])
+        self.clear()
+        return data
+
+    def clear(self) -> int:
+        """Drop buffered audio without sending it; returns the bytes dropped"""
+        dropped = self._length
+        self._length = 0
+        self._first_write_at = None
+        return dropped
@@ -0,0 +1,85 @@
+"""Micro-benchmark: client link audio codecs, cost and bandwidth per second of audio.
+
+For each format and direction, encodes and decodes speech-like PCM16 in the
+chunk sizes the link actually uses (browser mic chunks in, output buffer
+flushes out) and reports CPU time per second of audio, the bitrate on the
+wire, the bandwidth saved against PCM16 and the signal-to-noise ratio after
+a round trip.
+
+Run from the backend directory:
+    python -m benchmarks.bench_codec
+"""
+import argparse
+import math
+import timeit
+
+import numpy as np
+
+from codec import AUDIO_FORMATS, FORMAT_PCM16, AudioEncoder, decode_audio
+
+# (direction, sample rate, samples per message)
+LINKS = (
+    ("in", 16000, 2048),  # browser ScriptProcessor chunks
+    ("out", 24000, 6000),  # default output_frame_samples
+)
+
+
+def speech_like(seconds: float, sample_rate: int, seed: int) -> bytes:
+    """Voiced harmonics with a syllable-rate envelope, plus a little noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    signal = 6000 * envelope * voiced + rng.normal(0, 150, len(t))
+    return np.clip(signal, -32768, 32767).astype("<i2").tobytes()
+
+
+def snr_db(reference: bytes, decoded: bytes) -> float:
+    a = np.frombuffer(reference, dtype="<i2").astype(np.float64)
+    b = np.frombuffer(decoded, dtype="<i2").astype(np.float64)
+    noise = np.sum((a - b) ** 2)
+    return math.inf if noise == 0 else 10 * math.log10(np.sum(a * a) / noise)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'direction':>9} {'format':>10} {'encode':>12} {'decode':>12} {'kbit/s':>8} {'saved':>6} {'SNR':>7}")
+    for direction, sample_rate, chunk_samples in LINKS:
+        pcm = speech_like(args.seconds, sample_rate, args.seed)
+        chunk_bytes = chunk_samples * 2
+        chunks = [pcm[i:i + chunk_bytes] for i in range(0, len(pcm), chunk_bytes)]
+
+        for audio_format in AUDIO_FORMATS:
+            encoder = AudioEncoder(audio_format)
+            encoded = [encoder.encode(chunk) for chunk in chunks]
+            decoded = b"".join(decode_audio(audio_format, message) for message in encoded)
+
+            def encode_all():
+                encoder = AudioEncoder(audio_format)
+                for chunk in chunks:
+                    encoder.encode(chunk)
+
+            def decode_all():
+                for message in encoded:
+                    decode_audio(audio_format, message)
+
+            # Milliseconds of CPU per second of audio
+            encode_ms = min(timeit.repeat(encode_all, number=1, repeat=args.repeat)) / args.seconds * 1000
+            decode_ms = min(timeit.repeat(decode_all, number=1, repeat=args.repeat)) / args.seconds * 1000
+            wire_bytes = sum(len(message) for message in encoded)
+            kbits = wire_bytes * 8 / args.seconds / 1000
+            saved = 1 - wire_bytes / len(pcm)
+            snr = "-" if audio_format == FORMAT_PCM16 else f"{snr_db(pcm, decoded):.1f}dB"
+            print(f"{direction:>9} {audio_format:>10} {encode_ms:>8.3f}ms/s {decode_ms:>8.3f}ms/s "
+                  f"{kbits:>8.1f} {saved:>6.0%} {snr:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""Concurrent-session load test for /ws/realtime.
+
+Drives N simulated browser clients that speak the existing protocol: each one
+streams mic audio as input_audio_buffer.append messages at real-time pace,
+then waits for the AI's answer. Turn latency is measured from the last mic
+chunk of an utterance to the first response.audio.delta of the reply.
+
+By default a backend is spawned for every client count, running against the
+scripted fake Gemini (GEMINI_FAKE=1), so its memory can be sampled from /proc.
+Run from the backend directory:
+
+    python -m benchmarks.bench_load --clients 1,10,50,100
+    python -m benchmarks.bench_load --url ws://host:2179/ws/realtime --clients 20
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+INPUT_SAMPLE_RATE = 16000
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def mic_chunk(samples: int) -> str:
+    """Base64 PCM16 tone, the same shape the browser sends"""
+    pcm = struct.pack(
+        f"<{samples}h",
+        *(int(6000 * math.sin(2 * math.pi * 180 * i / INPUT_SAMPLE_RATE)) for i in range(samples))
+    )
+    return base64.b64encode(pcm).decode("ascii")
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def read_rss_bytes(pid: int):
+    """Resident memory of a process, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class ClientStats:
+    def __init__(self):
+        self.latencies = []
+        self.audio_bytes = 0
+        self.messages = 0
+        self.errors = 0
+
+
+async def run_client(url: str, turns: int, utterance_ms: int, chunk_samples: int, stats: ClientStats,
+                     turn_timeout: float) -> None:
+    """One simulated browser: speak, wait for the reply, repeat"""
+    chunk = json.dumps({"type": "input_audio_buffer.append", "audio": mic_chunk(chunk_samples)})
+    chunk_seconds = chunk_samples / INPUT_SAMPLE_RATE
+    chunks_per_utterance = max(1, math.ceil(utterance_ms / 1000 / chunk_seconds))
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            for _ in range(turns):
+                # Stream the utterance at real-time pace
+                next_send = time.perf_counter()
+                for _ in range(chunks_per_utterance):
+                    await ws.send(chunk)
+                    next_send += chunk_seconds
+                    await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+                speech_end = time.perf_counter() - chunk_seconds
+
+                # Wait for the reply
+                first_audio = None
+                deadline = time.perf_counter() + turn_timeout
+                while True:
+                    raw = await asyncio.wait_for(ws.recv(), max(0.0, deadline - time.perf_counter()))
+                    stats.messages += 1
+                    if isinstance(raw, bytes):
+                        continue
+                    message = json.loads(raw)
+                    if message["type"] == "response.audio.delta":
+                        if first_audio is None:
+                            first_audio = time.perf_counter()
+                            stats.latencies.append(first_audio - speech_end)
+                        stats.audio_bytes += len(message["delta"]) * 3 // 4
+                    elif message["type"] == "response.done":
+                        break
+    except Exception as e:
+        stats.errors += 1
+        print(f"client error: {e!r}", file=sys.stderr)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_backend(port: int, env_overrides: dict) -> subprocess.Popen:
+    env = dict(os.environ, GEMINI_FAKE="1", LOG_LEVEL="WARNING", **env_overrides)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("backend did not start")
+
+
+async def run_stage(url: str, clients: int, args, pid=None) -> dict:
+    stats = [ClientStats() for _ in range(clients)]
+    baseline_rss = read_rss_bytes(pid) if pid else None
+    peak_rss = [baseline_rss]
+
+    async def sample_memory():
+        while True:
+            rss = read_rss_bytes(pid)
+            if rss is not None:
+                peak_rss[0] = max(peak_rss[0] or 0, rss)
+            await asyncio.sleep(0.2)
+
+    sampler = asyncio.create_task(sample_memory()) if pid else None
+    started = time.perf_counter()
+
+    async def staggered(i):
+        # Spread connects over ramp_seconds so the handshake burst is realistic
+        await asyncio.sleep(args.ramp_seconds * i / clients)
+        await run_client(url, args.turns, args.utterance_ms, args.chunk_samples, stats[i], args.turn_timeout)
+
+    await asyncio.gather(*(staggered(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    if sampler:
+        sampler.cancel()
+
+    latencies = [latency for s in stats for latency in s.latencies]
+    per_session_memory = None
+    if baseline_rss is not None and peak_rss[0] is not None:
+        per_session_memory = (peak_rss[0] - baseline_rss) / clients
+    return {
+        "clients": clients,
+        "turns": len(latencies),
+        "errors": sum(s.errors for s in stats),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "audio_kib_per_s": sum(s.audio_bytes for s in stats) / elapsed / 1024,
+        "messages_per_s": sum(s.messages for s in stats) / elapsed,
+        "memory_per_session_kib": per_session_memory / 1024 if per_session_memory is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="existing backend to test; by default one is spawned per stage")
+    parser.add_argument("--clients", default="1,10,50", help="comma separated concurrent client counts")
+    parser.add_argument("--turns", type=int, default=3, help="turns per client")
+    parser.add_argument("--utterance-ms", type=int, default=1500, help="mic audio per turn")
+    parser.add_argument("--chunk-samples", type=int, default=2048, help="samples per mic chunk (browser: 2048)")
+    parser.add_argument("--ramp-seconds", type=float, default=1.0, help="spread connects over this long")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--response-delay-ms", type=int, default=300, help="fake model thinking time")
+    args = parser.parse_args()
+
+    fake_env = {
+        "GEMINI_FAKE_UTTERANCE_MS": str(args.utterance_ms),
+        "GEMINI_FAKE_RESPONSE_DELAY_MS": str(args.response_delay_ms),
+    }
+
+    print(f"{'clients':>7} {'turns':>6} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8} "
+          f"{'audio KiB/s':>11} {'msgs/s':>8} {'KiB/session':>11}")
+    for clients in (int(n) for n in args.clients.split(",")):
+        process = None
+        url = args.url
+        if url is None:
+            port = free_port()
+            process = spawn_backend(port, fake_env)
+            url = f"ws://127.0.0.1:{port}/ws/realtime"
+        try:
+            result = asyncio.run(run_stage(url, clients, args, process.pid if process else None))
+        finally:
+            if process:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+        memory = result["memory_per_session_kib"]
+        print(f"{result['clients']:>7} {result['turns']:>6} {result['errors']:>6} {result['p50_ms']:>8.1f} "
+              f"{result['p99_ms']:>8.1f} {result['mean_ms']:>8.1f} {result['audio_kib_per_s']:>11.1f} "
+              f"{result['messages_per_s']:>8.1f} {memory if memory is None else format(memory, '11.1f'):>11}")
+
+
+if __name__ == "__main__":
+    main()
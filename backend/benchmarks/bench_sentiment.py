@@ -0,0 +1,166 @@
+"""Micro-benchmark: compiled sentiment matcher vs the original nested scans.
+
+Also compares following a transcript that arrives in fragments with
+StreamingSentiment against rescanning the whole transcript after each one.
+
+Run from the backend directory:
+    python -m benchmarks.bench_sentiment
+"""
+import argparse
+import random
+import timeit
+
+from sentiment import (
+    NEGATIONS,
+    NEGATIVE_WORDS,
+    POSITIVE_WORDS,
+    STRONG_NEGATIVE_PHRASES,
+    STRONG_POSITIVE_PHRASES,
+    StreamingSentiment,
+    analyze_sentiment,
+    analyze_sentiment_batch,
+)
+
+
+def reference_analyze_sentiment(text: str) -> str:
+    """The original implementation: one substring scan per phrase and word"""
+    text_lower = text.lower()
+
+    positive_words = list(POSITIVE_WORDS)
+    negative_words = list(NEGATIVE_WORDS)
+    negations = list(NEGATIONS)
+    strong_negative_phrases = list(STRONG_NEGATIVE_PHRASES)
+    strong_positive_phrases = list(STRONG_POSITIVE_PHRASES)
+
+    for phrase in strong_negative_phrases:
+        if phrase in text_lower:
+            return "NEGATIVE"
+
+    for phrase in strong_positive_phrases:
+        if phrase in text_lower:
+            return "POSITIVE"
+
+    for negation in negations:
+        for positive_word in positive_words:
+            if f"{negation} {positive_word}" in text_lower or f"{negation} feel {positive_word}" in text_lower:
+                return "NEGATIVE"
+
+    positive_count = sum(1 for word in positive_words if word in text_lower)
+    negative_count = sum(1 for word in negative_words if word in text_lower)
+
+    if len(text_lower.strip()) < 5 or text_lower.strip() in ['hi', 'hello', 'hey', 'yes', 'no', 'ok', 'okay']:
+        return "NEUTRAL"
+
+    if positive_count > negative_count:
+        return "POSITIVE"
+    elif negative_count > positive_count:
+        return "NEGATIVE"
+    else:
+        return "NEUTRAL"
+
+
+FILLER = (
+    "so today i went to the shops and then came home and made a cup of tea "
+    "and sat in the garden for a while thinking about the week ahead "
+)
+
+
+def make_transcripts(count: int, length: int, seed: int):
+    """Long, mostly neutral transcripts with a few scattered sentiment words"""
+    rng = random.Random(seed)
+    vocabulary = list(POSITIVE_WORDS + NEGATIVE_WORDS + NEGATIONS) + ['feel', 'feeling', 'really', 'my', 'back']
+    transcripts = []
+    for _ in range(count):
+        words = []
+        while sum(len(w) + 1 for w in words) < length:
+            if rng.random() < 0.05:
+                words.append(rng.choice(vocabulary))
+            else:
+                words.extend(FILLER.split()[:rng.randint(1, 6)])
+        transcripts.append(' '.join(words).capitalize())
+    return transcripts
+
+
+def check_equivalence(transcripts):
+    """Fail loudly if the compiled matcher disagrees with the reference"""
+    for text in transcripts:
+        expected = reference_analyze_sentiment(text)
+        assert analyze_sentiment(text) == expected, text
+    assert analyze_sentiment_batch(transcripts) == [reference_analyze_sentiment(t) for t in transcripts]
+
+
+def split_fragments(text: str, rng: random.Random):
+    """Cut a transcript into transcription-sized fragments, ignoring word boundaries"""
+    fragments = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(3, 20)
+        fragments.append(text[i:i + size])
+        i += size
+    return fragments
+
+
+def check_streaming_equivalence(fragmented):
+    """Fail loudly if the streaming tracker ever disagrees with a full rescan"""
+    for fragments in fragmented:
+        tracker = StreamingSentiment()
+        text = ''
+        for fragment in fragments:
+            text += fragment
+            assert tracker.feed(fragment) == analyze_sentiment(text), text
+
+
+def rescan_each_fragment(fragments):
+    text = ''
+    for fragment in fragments:
+        text += fragment
+        analyze_sentiment(text)
+
+
+def stream_fragments(fragments):
+    tracker = StreamingSentiment()
+    for fragment in fragments:
+        tracker.feed(fragment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200, help="transcripts per length")
+    parser.add_argument("--lengths", default="80,500,2000,10000", help="comma separated transcript lengths")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'length':>8} {'reference':>12} {'compiled':>12} {'batch':>12} {'speedup':>8}")
+    for length in (int(n) for n in args.lengths.split(',')):
+        transcripts = make_transcripts(args.count, length, args.seed)
+        check_equivalence(transcripts)
+
+        def per_call(fn):
+            best = min(timeit.repeat(lambda: [fn(t) for t in transcripts], number=1, repeat=args.repeat))
+            return best / len(transcripts) * 1e6
+
+        reference_us = per_call(reference_analyze_sentiment)
+        compiled_us = per_call(analyze_sentiment)
+        batch_us = min(timeit.repeat(lambda: analyze_sentiment_batch(transcripts), number=1, repeat=args.repeat)) / len(transcripts) * 1e6
+        print(f"{length:>8} {reference_us:>10.1f}us {compiled_us:>10.1f}us {batch_us:>10.1f}us {reference_us / compiled_us:>7.1f}x")
+
+    # Cost of keeping sentiment current for a whole transcript, fed fragment by fragment
+    print()
+    print(f"{'length':>8} {'rescan':>12} {'streaming':>12} {'speedup':>8}")
+    rng = random.Random(args.seed)
+    for length in (int(n) for n in args.lengths.split(',')):
+        fragmented = [split_fragments(t, rng) for t in make_transcripts(args.count, length, args.seed)]
+        check_streaming_equivalence(fragmented[:20])
+
+        def per_transcript(fn):
+            best = min(timeit.repeat(lambda: [fn(f) for f in fragmented], number=1, repeat=args.repeat))
+            return best / len(fragmented) * 1e6
+
+        rescan_us = per_transcript(rescan_each_fragment)
+        streaming_us = per_transcript(stream_fragments)
+        print(f"{length:>8} {rescan_us:>10.1f}us {streaming_us:>10.1f}us {rescan_us / streaming_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
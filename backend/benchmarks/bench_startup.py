@@ -0,0 +1,82 @@
+"""Micro-benchmark: worker startup and per-connection session setup.
+
+Measures how long a fresh process takes to import main (what every worker
+pays before it can serve), the Gemini client construction that is now
+deferred to the first session, and the Live session config each connection
+needs: rebuilt from scratch as it used to be, against a copy of the
+persona's prebuilt config.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from google import genai
+from google.genai import types
+
+from personas import ELLEN_PROMPT, PersonaRegistry
+
+
+def reference_build_live_config(handle=None) -> types.LiveConnectConfig:
+    """The original per-connection config, built from scratch every time"""
+    return types.LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Aoede")
+            )
+        ),
+        output_audio_transcription=types.AudioTranscriptionConfig(),
+        input_audio_transcription=types.AudioTranscriptionConfig(),
+        session_resumption=types.SessionResumptionConfig(handle=handle),
+        system_instruction=ELLEN_PROMPT
+    )
+
+
+def import_seconds(module: str) -> float:
+    """Wall time for a fresh interpreter to import a module"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "unused"))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--imports", type=int, default=5, help="fresh processes to time")
+    parser.add_argument("--number", type=int, default=2000, help="configs per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Worker startup
+    imports = [import_seconds("main") for _ in range(args.imports)]
+    print(f"import main (median of {args.imports}): {statistics.median(imports) * 1000:8.1f}ms")
+    started = time.perf_counter()
+    genai.Client(api_key="unused")
+    print(f"genai.Client(), deferred to first use: {(time.perf_counter() - started) * 1000:8.1f}ms")
+    started = time.perf_counter()
+    registry = PersonaRegistry()
+    print(f"persona registry ({len(registry.names)} personas), once: {(time.perf_counter() - started) * 1000:8.1f}ms")
+
+    # Per-connection config
+    persona = registry.default
+
+    def per_call(fn):
+        return min(timeit.repeat(fn, number=args.number, repeat=args.repeat)) / args.number * 1e6
+
+    print()
+    print(f"{'per connection':>16} {'rebuilt':>10} {'prebuilt':>10} {'speedup':>8}")
+    for label, handle in (("new session", None), ("resume", "handle")):
+        rebuilt_us = per_call(lambda: reference_build_live_config(handle))
+        prebuilt_us = per_call(lambda: persona.connect_config(handle))
+        print(f"{label:>16} {rebuilt_us:>8.1f}us {prebuilt_us:>8.1f}us {rebuilt_us / prebuilt_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
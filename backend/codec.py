@@ -0,0 +1,235 @@
+"""Compact audio encodings for the client side of /ws/realtime.
+
+Gemini always gets and produces PCM16; clients on slow links can ask for a
+smaller encoding on their side with session.update:
+
+    {"type": "session.update",
+     "session": {"input_audio_format": "g711_ulaw", "output_audio_format": "ima_adpcm"}}
+
+    pcm16      16-bit little-endian PCM (default)
+    g711_ulaw  G.711 mu-law, 8 bits per sample (1/2 the size)
+    ima_adpcm  IMA ADPCM, 4 bits per sample (1/4 the size)
+
+Sample rates are unchanged (16kHz in, 24kHz out). Mu-law is a table lookup
+in both directions. Each IMA ADPCM message stands alone: a 4-byte header
+(initial predictor as int16 LE, step index, flags) followed by 4-bit codes,
+two per byte, low nibble first. Flag bit 0 marks a padding nibble at the
+end. The encoder carries its state from one message to the next, so audio
+quality is continuous, but a message can be decoded without the ones before
+it. Packing, unpacking and decoding are vectorized with NumPy: the step
+index walk and the predictor are both running sums clamped to a range,
+computed with cumulative sums and fixed up where they hit a bound. ADPCM
+encoding is inherently sample by sample, so that part runs on precomputed
+tables; main.py runs ADPCM in a worker thread to keep it off the event loop.
+"""
+import struct
+
+import numpy as np
+
+FORMAT_PCM16 = "pcm16"
+FORMAT_ULAW = "g711_ulaw"
+FORMAT_ADPCM = "ima_adpcm"
+AUDIO_FORMATS = (FORMAT_PCM16, FORMAT_ULAW, FORMAT_ADPCM)
+
+
+class CodecError(ValueError):
+    """Raised for audio that cannot be decoded in the negotiated format"""
+
+
+# --- G.711 mu-law -----------------------------------------------------------
+
+ULAW_BIAS = 0x84
+ULAW_CLIP = 8159  # in 14-bit magnitude
+_ULAW_SEGMENT_ENDS = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+
+
+def _build_ulaw_tables():
+    """Encode table indexed by the uint16 view of a sample, and the 256-entry decode table"""
+    # Same arithmetic as the reference G.711 coder (and the old audioop module)
+    samples = np.arange(-32768, 32768, dtype=np.int32)
+    value = samples >> 2
+    mask = np.where(value < 0, 0x7F, 0xFF)
+    value = np.minimum(np.abs(value), ULAW_CLIP) + (ULAW_BIAS >> 2)
+    segment = np.searchsorted(_ULAW_SEGMENT_ENDS, value)
+    encoded = np.where(segment < 8, (segment << 4) | ((value >> (segment + 1)) & 0x0F), 0x7F) ^ mask
+    encode = np.empty(65536, dtype=np.uint8)
+    encode[samples.astype(np.int16).view(np.uint16)] = encoded
+
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = ((((codes & 0x0F) << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    decode = np.where(codes & 0x80, -magnitude, magnitude).astype("<i2")
+    return encode, decode
+
+
+_ULAW_ENCODE, _ULAW_DECODE = _build_ulaw_tables()
+
+
+def encode_ulaw(pcm) -> bytes:
+    samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+    return _ULAW_ENCODE[samples.view(np.uint16)].tobytes()
+
+
+def decode_ulaw(data) -> bytes:
+    return _ULAW_DECODE[np.frombuffer(data, dtype=np.uint8)].tobytes()
+
+
+# --- IMA ADPCM --------------------------------------------------------------
+
+ADPCM_HEADER = struct.Struct("<hBB")  # predictor, step index, flags
+ADPCM_PADDED = 0x01
+
+_STEP_TABLE = (
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+)
+_INDEX_ADJUST = (-1, -1, -1, -1, 2, 4, 6, 8)
+
+
+def _build_adpcm_tables():
+    """Predictor change and next step index for every (step index, code) pair"""
+    deltas, next_index = [], []
+    for index, step in enumerate(_STEP_TABLE):
+        for code in range(16):
+            delta = step >> 3
+            if code & 4:
+                delta += step
+            if code & 2:
+                delta += step >> 1
+            if code & 1:
+                delta += step >> 2
+            deltas.append(-delta if code & 8 else delta)
+            next_index.append(min(88, max(0, index + _INDEX_ADJUST[code & 7])))
+    return tuple(deltas), tuple(next_index)
+
+
+# Indexed by step_index * 16 + code
+_ADPCM_DELTA, _ADPCM_NEXT_INDEX = _build_adpcm_tables()
+_ADPCM_DELTA_ARRAY = np.array(_ADPCM_DELTA, dtype=np.int32)
+_INDEX_ADJUST_ARRAY = np.array(_INDEX_ADJUST * 2, dtype=np.int32)  # indexed by code
+
+# Upper-bound hits fixed up by restarting the running sum before falling back to a
+# plain loop; bounds a crafted message that sits at the limit to linear time
+MAX_CLAMP_RESTARTS = 16
+
+
+def encode_adpcm(pcm, predictor: int = 0, index: int = 0):
+    """Encode PCM16 starting from the given state; returns (message, predictor, index)"""
+    header_predictor, header_index = predictor, index
+    samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2).tolist()
+    codes = bytearray(len(samples))
+    steps, deltas, next_index = _STEP_TABLE, _ADPCM_DELTA, _ADPCM_NEXT_INDEX
+
+    for i, sample in enumerate(samples):
+        diff = sample - predictor
+        if diff < 0:
+            code = 8 | min(7, (-diff << 2) // steps[index])
+        else:
+            code = min(7, (diff << 2) // steps[index])
+        key = index * 16 + code
+        predictor += deltas[key]
+        if predictor > 32767:
+            predictor = 32767
+        elif predictor < -32768:
+            predictor = -32768
+        index = next_index[key]
+        codes[i] = code
+
+    nibbles = np.frombuffer(codes, dtype=np.uint8)
+    padded = len(nibbles) % 2
+    if padded:
+        nibbles = np.append(nibbles, np.uint8(0))
+    packed = nibbles[0::2] | (nibbles[1::2] << 4)
+    header = ADPCM_HEADER.pack(header_predictor, header_index, ADPCM_PADDED if padded else 0)
+    return header + packed.tobytes(), predictor, index
+
+
+def decode_adpcm(data) -> bytes:
+    """Decode one IMA ADPCM message to PCM16"""
+    if len(data) < ADPCM_HEADER.size:
+        raise CodecError(f"ADPCM message too short: {len(data)} bytes")
+    predictor, index, flags = ADPCM_HEADER.unpack_from(data)
+    if index > 88:
+        raise CodecError(f"Invalid ADPCM step index: {index}")
+
+    packed = np.frombuffer(data, dtype=np.uint8, offset=ADPCM_HEADER.size)
+    codes = np.empty(len(packed) * 2, dtype=np.int32)
+    codes[0::2] = packed & 0x0F
+    codes[1::2] = packed >> 4
+    if flags & ADPCM_PADDED and len(codes):
+        codes = codes[:-1]
+
+    # The step index sequence depends on the codes alone (the index used for
+    # each code is the one left by the codes before it)...
+    walk = _clamped_cumsum(index, _INDEX_ADJUST_ARRAY[codes], 0, 88)
+    indexes = np.concatenate(([index], walk[:-1])).astype(np.int32)
+    # ...and the predictor is a running sum of the deltas they select
+    samples = _clamped_cumsum(predictor, _ADPCM_DELTA_ARRAY[indexes * 16 + codes], -32768, 32767)
+    return samples.astype("<i2").tobytes()
+
+
+def _clamped_cumsum(start: int, steps, low: int, high: int):
+    """x[k] = clamp(x[k-1] + steps[k], low, high) with x[-1] = start, vectorized"""
+    out = np.empty(len(steps), dtype=np.int64)
+    position, value = 0, start
+    for _ in range(MAX_CLAMP_RESTARTS):
+        if position == len(steps):
+            return out
+        # Clamping at the lower bound alone has a closed form: the running sum minus
+        # the deepest it has gone below the bound so far
+        sums = value - low + np.cumsum(steps[position:], dtype=np.int64)
+        run = sums - np.minimum(np.minimum.accumulate(sums), 0) + low
+        over = np.flatnonzero(run > high)
+        if not len(over):
+            out[position:] = run
+            return out
+        # Clamp at the first upper-bound hit and carry on from there
+        end = position + over[0]
+        out[position:end] = run[:over[0]]
+        out[end] = value = high
+        position = end + 1
+    tail = []
+    for step in steps[position:].tolist():
+        value = min(high, max(low, value + step))
+        tail.append(value)
+    out[position:] = tail
+    return out
+
+
+# --- Per-session use ---------------------------------------------------------
+
+class AudioEncoder:
+    """Encodes outgoing PCM16 in a session's output format"""
+
+    def __init__(self, audio_format: str = FORMAT_PCM16):
+        self.configure(audio_format)
+
+    def configure(self, audio_format: str) -> None:
+        """Switch format; the ADPCM state starts over"""
+        if audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unknown audio format: {audio_format!r}")
+        self.format = audio_format
+        self._predictor = 0
+        self._index = 0
+
+    def encode(self, pcm) -> bytes:
+        if self.format == FORMAT_ULAW:
+            return encode_ulaw(pcm)
+        if self.format == FORMAT_ADPCM:
+            data, self._predictor, self._index = encode_adpcm(pcm, self._predictor, self._index)
+            return data
+        return bytes(pcm)
+
+
+def decode_audio(audio_format: str, data) -> bytes:
+    """Decode incoming audio in a session's input format to PCM16"""
+    if audio_format == FORMAT_ULAW:
+        return decode_ulaw(data)
+    if audio_format == FORMAT_ADPCM:
+        return decode_adpcm(data)
+    return data
@@ -0,0 +1,149 @@
+"""Local stand-in for the Gemini Live API, for benchmarks and load tests.
+
+FakeLiveClient mimics the part of genai.Client used by main.py:
+
+    async with client.aio.live.connect(model=..., config=...) as session:
+        await session.send_realtime_input(audio=types.Blob(...))
+        async for message in session.receive(): ...
+
+Each session waits until it has received `utterance_ms` of mic audio, then
+plays a scripted turn: input transcription fragments, `response_delay_ms` of
+"thinking", a stream of 24kHz PCM16 audio chunks with output transcription,
+a session resumption update and finally turn_complete. Messages are real
+google.genai LiveServerMessage objects, so the backend handles them exactly
+as it would upstream ones. With `drop_on_turn` set, every session fails
+partway through that turn, as if the upstream connection had dropped.
+
+Start the backend against it with GEMINI_FAKE=1; the timing is configured
+with the GEMINI_FAKE_* environment variables read by FakeScript.from_env().
+"""
+import asyncio
+import math
+import os
+import struct
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+from google.genai import types
+
+INPUT_BYTES_PER_MS = 32  # 16kHz PCM16
+OUTPUT_SAMPLE_RATE = 24000
+
+
+@dataclass(frozen=True)
+class FakeScript:
+    """Timing and content of the scripted model turns"""
+    utterance_ms: int = 1500  # mic audio needed before the model answers
+    response_delay_ms: int = 300  # end of utterance to first audio chunk
+    audio_chunks: int = 20  # audio chunks per model turn
+    chunk_ms: int = 40  # duration of each audio chunk
+    chunk_interval_ms: int = 40  # time between audio chunks
+    drop_on_turn: int = 0  # drop each session halfway through this turn (0 = never)
+    user_text: str = "I have not been feeling great today"
+    model_text: str = "I'm sorry to hear that. Do you want to tell me a bit more about it?"
+
+    @classmethod
+    def from_env(cls) -> "FakeScript":
+        overrides = {}
+        for field in fields(cls):
+            value = os.getenv(f"GEMINI_FAKE_{field.name.upper()}")
+            if value is not None:
+                overrides[field.name] = field.type(value)
+        return cls(**overrides)
+
+
+@lru_cache(maxsize=None)
+def _tone(duration_ms: int, frequency: float = 220.0) -> bytes:
+    """PCM16 sine tone at the output sample rate"""
+    samples = OUTPUT_SAMPLE_RATE * duration_ms // 1000
+    return struct.pack(
+        f"<{samples}h",
+        *(int(8000 * math.sin(2 * math.pi * frequency * i / OUTPUT_SAMPLE_RATE)) for i in range(samples))
+    )
+
+
+class FakeLiveSession:
+    """Scripted replacement for google.genai.live.AsyncSession"""
+
+    def __init__(self, script: FakeScript):
+        self.script = script
+        self._chunk = _tone(script.chunk_ms)
+        self._received_bytes = 0
+        self._turns = asyncio.Queue()
+        self._turns_played = 0
+        self._dropped = False
+
+    async def send_realtime_input(self, *, audio=None, audio_stream_end=None, **kwargs) -> None:
+        if self._dropped:
+            raise ConnectionError("fake upstream connection dropped")
+        if audio is not None:
+            self._received_bytes += len(audio.data)
+            utterance_bytes = self.script.utterance_ms * INPUT_BYTES_PER_MS
+            while self._received_bytes >= utterance_bytes:
+                self._received_bytes -= utterance_bytes
+                self._turns.put_nowait(True)
+
+    async def receive(self):
+        """Yield one scripted model turn, ending with turn_complete"""
+        if self._dropped:
+            raise ConnectionError("fake upstream connection dropped")
+        await self._turns.get()
+        script = self.script
+        self._turns_played += 1
+        drop_at = script.audio_chunks // 2 if self._turns_played == script.drop_on_turn else None
+
+        for word in script.user_text.split(" "):
+            yield types.LiveServerMessage(server_content=types.LiveServerContent(
+                input_transcription=types.Transcription(text=word + " ")
+            ))
+
+        await asyncio.sleep(script.response_delay_ms / 1000)
+
+        words = script.model_text.split(" ")
+        for i in range(script.audio_chunks):
+            if i == drop_at:
+                self._dropped = True
+                raise ConnectionError("fake upstream connection dropped")
+            yield types.LiveServerMessage(server_content=types.LiveServerContent(
+                model_turn=types.Content(parts=[
+                    types.Part(inline_data=types.Blob(mime_type="audio/pcm;rate=24000", data=self._chunk))
+                ])
+            ))
+            if i < len(words):
+                yield types.LiveServerMessage(server_content=types.LiveServerContent(
+                    output_transcription=types.Transcription(text=words[i] + " ")
+                ))
+            await asyncio.sleep(script.chunk_interval_ms / 1000)
+
+        yield types.LiveServerMessage(session_resumption_update=types.LiveServerSessionResumptionUpdate(
+            new_handle=f"fake-{id(self):x}-{self._turns_played}", resumable=True
+        ))
+        yield types.LiveServerMessage(server_content=types.LiveServerContent(turn_complete=True))
+
+
+class _FakeLive:
+    def __init__(self, script: FakeScript, handshake_ms: int):
+        self.script = script
+        self.handshake_ms = handshake_ms
+
+    @asynccontextmanager
+    async def connect(self, *, model: str, config=None):
+        await asyncio.sleep(self.handshake_ms / 1000)
+        yield FakeLiveSession(self.script)
+
+
+class _FakeAio:
+    def __init__(self, live: _FakeLive):
+        self.live = live
+
+
+class FakeLiveClient:
+    """Drop-in for genai.Client as far as client.aio.live.connect() goes"""
+
+    def __init__(self, script: FakeScript = FakeScript(), handshake_ms: int = 0):
+        self.aio = _FakeAio(_FakeLive(script, handshake_ms))
+
+    @classmethod
+    def from_env(cls) -> "FakeLiveClient":
+        return cls(FakeScript.from_env(), int(os.getenv("GEMINI_FAKE_HANDSHAKE_MS", "0")))
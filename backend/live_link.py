@@ -0,0 +1,259 @@
+"""Gemini Live session that survives upstream drops by resuming.
+
+LiveLink stands in for a Live session in the /ws/realtime handler (same
+send_realtime_input() and receive() calls) while keeping track of the
+session resumption handles Gemini sends. When the upstream connection drops,
+or Gemini announces with go_away that it is about to close it, the link
+connects again with the latest handle, which restores the conversation
+state on the new connection, and the client never notices.
+
+Anything the resumed state may not include is replayed: the link keeps the
+realtime input sent since the latest handle (up to `replay_limit` bytes of
+audio) and resends it after reconnecting. When the session is configured
+for transparent resumption, Gemini reports the index of the last client
+message it consumed with each handle, and only later messages are kept;
+otherwise everything sent before a handle arrived is assumed covered by it,
+and so is everything sent before the model started answering or finished
+generating: the model has heard that input, and replaying it would invite a
+second answer to it. The cost is that speech sent while the model was
+answering, shortly before a drop, can be lost if no handle covered it.
+
+If the link cannot reconnect (and replay) within RECONNECT_ATTEMPTS, or
+the upstream keeps dropping that many times in a row without delivering a
+message in between, it gives up for good: receive() and every later send raise UpstreamLost, so
+the caller can end the conversation instead of retrying per message.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import AsyncExitStack
+from typing import Callable, Optional
+
+from google.genai import types
+
+logger = logging.getLogger("ellen.link")
+
+
+class UpstreamLost(ConnectionError):
+    """The Live session dropped and could not be resumed"""
+
+
+class _SentInput:
+    __slots__ = ("index", "kwargs", "size")
+
+    def __init__(self, index, kwargs, size):
+        self.index = index  # position among the messages sent on the current connection
+        self.kwargs = kwargs
+        self.size = size
+
+
+class LiveLink:
+    """A Live session that reconnects with its resumption handle when dropped"""
+
+    # Reconnect attempts per drop, and the delay before each retry
+    RECONNECT_ATTEMPTS = 3
+    RETRY_DELAY = 0.5
+
+    def __init__(self, first_session, reconnect, replay_limit: int = 320000,
+                 on_reconnect: Optional[Callable[[str, float, int], None]] = None,
+                 transparent: bool = False):
+        # first_session: async context manager for the initial session (e.g. from the pool)
+        # reconnect(handle): async context manager for a new session resuming `handle`
+        self._first_session = first_session
+        self._reconnect_session = reconnect
+        self.replay_limit = replay_limit
+        self._on_reconnect = on_reconnect
+        # Whether the session reports the last client message each handle covers
+        self.transparent = transparent
+
+        self._stack = AsyncExitStack()
+        self._session = None
+        self._generation = 0  # bumped on every reconnect
+        self._lock = asyncio.Lock()
+
+        self.handle = None
+        self._sent = deque()
+        self._sent_bytes = 0
+        self._sent_on_connection = 0
+        self._turn_in_progress = False
+        self._turn_lost = False  # a reconnect cut a model turn short
+        self._go_away = False
+        self.failed = False  # gave up reconnecting; the link is unusable
+        self._drops_in_a_row = 0  # reconnects since the upstream last delivered a message
+
+        # Statistics
+        self.reconnects = 0
+        self.replayed_bytes = 0
+
+    async def __aenter__(self) -> "LiveLink":
+        self._session = await self._stack.enter_async_context(self._first_session)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._close_session()
+
+    async def send_realtime_input(self, **kwargs) -> None:
+        """Send realtime input, reconnecting (and replaying) if the upstream has dropped"""
+        async with self._lock:
+            if self.failed:
+                raise UpstreamLost("Live session could not be resumed")
+            entry = self._remember(kwargs)
+            generation = self._generation
+            try:
+                await self._session.send_realtime_input(**kwargs)
+                return
+            except Exception as e:
+                logger.warning("Upstream send failed: %s", e)
+        # The reconnect replays the remembered input, this message included
+        await self._reconnect(generation, "send_error")
+        if entry is None:
+            # Too large to remember, so it was not replayed
+            await self.send_realtime_input(**kwargs)
+
+    async def receive(self):
+        """Yield messages until the end of the model turn, across reconnects"""
+        while True:
+            if self.failed:
+                raise UpstreamLost("Live session could not be resumed")
+            if self._turn_lost:
+                # The response in flight is gone; end it for the client
+                self._turn_lost = False
+                yield types.LiveServerMessage(server_content=types.LiveServerContent(turn_complete=True))
+                return
+
+            generation = self._generation
+            session = self._session
+            try:
+                async for message in session.receive():
+                    if self._observe(message):
+                        yield message
+                    if message.server_content and message.server_content.turn_complete:
+                        break
+                    if self._go_away and not self._turn_in_progress:
+                        break
+                else:
+                    # Some sessions end receive() without turn_complete when closed
+                    raise ConnectionError("Live session ended")
+            except Exception as e:
+                if generation == self._generation:
+                    logger.warning("Upstream receive failed: %s", e)
+                    await self._reconnect(generation, "receive_error")
+                continue
+
+            if self._go_away and not self._turn_in_progress:
+                # Move to a new connection between turns, before the old one is closed
+                await self._reconnect(generation, "go_away")
+                continue
+            return
+
+    def _observe(self, message) -> bool:
+        """Track turns, handles and go_away; returns whether to pass the message on"""
+        self._drops_in_a_row = 0
+        if message.session_resumption_update:
+            update = message.session_resumption_update
+            if update.resumable and update.new_handle:
+                self.handle = update.new_handle
+                self._forget_consumed(update.last_consumed_client_message_index)
+            return False
+        if message.go_away:
+            logger.info("Upstream going away in %s", message.go_away.time_left)
+            self._go_away = True
+            return False
+        content = message.server_content
+        if content:
+            answered = content.turn_complete or content.generation_complete
+            if content.turn_complete or content.interrupted:
+                self._turn_in_progress = False
+            elif content.model_turn:
+                answered = answered or not self._turn_in_progress
+                self._turn_in_progress = True
+            if answered and not self.transparent:
+                # The model has heard everything sent so far; don't replay it
+                self._forget_consumed(self._sent_on_connection - 1)
+        return True
+
+    def _remember(self, kwargs) -> Optional[_SentInput]:
+        """Keep sent input until a resumption handle covers it"""
+        audio = kwargs.get("audio")
+        size = len(audio.data) if audio is not None else 0
+        index = self._sent_on_connection
+        self._sent_on_connection += 1
+        if size > self.replay_limit:
+            return None
+        entry = _SentInput(index, kwargs, size)
+        self._sent.append(entry)
+        self._sent_bytes += size
+        while self._sent_bytes > self.replay_limit:
+            self._sent_bytes -= self._sent.popleft().size
+        return entry
+
+    def _forget_consumed(self, last_consumed_index: Optional[int]) -> None:
+        while self._sent and (last_consumed_index is None or self._sent[0].index <= last_consumed_index):
+            self._sent_bytes -= self._sent.popleft().size
+
+    async def _reconnect(self, failed_generation: int, reason: str) -> None:
+        """Replace the session, unless another task already did since it failed"""
+        async with self._lock:
+            if self.failed:
+                raise UpstreamLost("Live session could not be resumed")
+            if failed_generation != self._generation:
+                return
+            if reason != "go_away":
+                self._drops_in_a_row += 1
+                if self._drops_in_a_row > self.RECONNECT_ATTEMPTS:
+                    self._give_up(f"dropped {self._drops_in_a_row} times in a row")
+            started = time.monotonic()
+            if self.handle is None:
+                logger.warning("Reconnecting upstream (%s) without a resumption handle; context is lost", reason)
+            else:
+                logger.info("Resuming upstream session (%s)", reason)
+            await self._close_session()
+
+            for attempt in range(self.RECONNECT_ATTEMPTS):
+                self._stack = AsyncExitStack()
+                try:
+                    self._session = await self._stack.enter_async_context(self._reconnect_session(self.handle))
+                    replayed = await self._replay()
+                    break
+                except Exception as e:
+                    await self._close_session()
+                    logger.warning("Upstream reconnect attempt %d failed: %s", attempt + 1, e)
+                    if attempt + 1 == self.RECONNECT_ATTEMPTS:
+                        self._give_up(f"{self.RECONNECT_ATTEMPTS} reconnect attempts failed, last: {e}")
+                    await asyncio.sleep(self.RETRY_DELAY * (attempt + 1))
+
+            self._generation += 1
+            self._turn_lost = self._turn_lost or self._turn_in_progress
+            self._turn_in_progress = False
+            self._go_away = False
+            self.reconnects += 1
+            self.replayed_bytes += replayed
+
+            seconds = time.monotonic() - started
+            logger.info("Upstream %s after %.3fs, replayed %d bytes", "resumed" if self.handle else "reconnected", seconds, replayed)
+            if self._on_reconnect is not None:
+                self._on_reconnect(reason, seconds, replayed)
+
+    def _give_up(self, why: str) -> None:
+        self.failed = True
+        logger.error("Giving up on the upstream session: %s", why)
+        raise UpstreamLost(f"Live session could not be resumed: {why}")
+
+    async def _replay(self) -> int:
+        """Resend what the resumed state may be missing; returns the audio bytes resent"""
+        self._sent_on_connection = 0
+        replayed = 0
+        for entry in self._sent:
+            entry.index = self._sent_on_connection
+            self._sent_on_connection += 1
+            await self._session.send_realtime_input(**entry.kwargs)
+            replayed += entry.size
+        return replayed
+
+    async def _close_session(self) -> None:
+        stack, self._stack = self._stack, AsyncExitStack()
+        try:
+            await stack.aclose()
+        except Exception as e:
+            logger.warning("Error closing Live session: %s", e)
@@ -0,0 +1,168 @@
+"""Pool of pre-connected Gemini Live sessions.
+
+Opening a Live session costs a full upstream WebSocket handshake plus session
+setup. With a pool, that cost is paid in the background: idle sessions are
+connected ahead of time and handed to new clients immediately. Sessions hold
+conversation state, so each one is used by exactly one client and then closed;
+the pool refills itself as sessions are taken or age out.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+
+logger = logging.getLogger("ellen.pool")
+
+
+class _PooledSession:
+    __slots__ = ("session", "stack", "created_at")
+
+    def __init__(self, session, stack, created_at):
+        self.session = session
+        self.stack = stack
+        self.created_at = created_at
+
+
+class LiveSessionPool:
+    """Keeps up to `size` idle sessions no older than `max_age` seconds"""
+
+    # How long to wait before retrying after a failed background connect
+    RETRY_DELAY = 5.0
+
+    def __init__(self, connect, size: int = 0, max_age: float = 120.0):
+        # connect() must return an async context manager yielding a session,
+        # e.g. lambda: client.aio.live.connect(model=..., config=...)
+        self._connect = connect
+        self.size = size
+        self.max_age = max_age
+        self._idle = deque()
+        self._connecting = 0
+        self._wakeup = None
+        self._refill_task = None
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.connect_failures = 0
+        self._handshakes = 0
+        self._handshake_seconds = 0.0
+
+    async def start(self) -> None:
+        """Start filling the pool in the background"""
+        if self.size > 0 and self._refill_task is None:
+            self._wakeup = asyncio.Event()
+            self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def close(self) -> None:
+        """Stop refilling and close every idle session"""
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+        while self._idle:
+            await self._discard(self._idle.popleft())
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Yield a ready session, connecting a fresh one if the pool is empty"""
+        pooled = self._take()
+        if pooled is not None:
+            self.hits += 1
+            self._wakeup.set()  # Let the refill loop replace it
+        else:
+            self.misses += 1
+            pooled = await self._open()
+        try:
+            yield pooled.session
+        finally:
+            await self._discard(pooled)
+
+    def _take(self):
+        """Pop the freshest idle session that has not aged out"""
+        # If the freshest session has expired, so has everything older; the
+        # refill loop closes them
+        if self._idle and time.monotonic() - self._idle[-1].created_at < self.max_age:
+            return self._idle.pop()
+        return None
+
+    async def _open(self) -> _PooledSession:
+        stack = AsyncExitStack()
+        started = time.monotonic()
+        try:
+            session = await stack.enter_async_context(self._connect())
+        except BaseException:
+            await stack.aclose()
+            raise
+        finished = time.monotonic()
+        self._handshakes += 1
+        self._handshake_seconds += finished - started
+        return _PooledSession(session, stack, finished)
+
+    async def _discard(self, pooled: _PooledSession) -> None:
+        try:
+            await pooled.stack.aclose()
+        except Exception as e:
+            logger.warning("Error closing Live session: %s", e)
+
+    async def _refill_loop(self) -> None:
+        while True:
+            # Age out sessions the upstream may already have dropped
+            now = time.monotonic()
+            while self._idle and now - self._idle[0].created_at >= self.max_age:
+                self.expired += 1
+                await self._discard(self._idle.popleft())
+
+            missing = self.size - len(self._idle) - self._connecting
+            if missing > 0:
+                self._connecting += missing
+                results = await asyncio.gather(
+                    *(self._open() for _ in range(missing)),
+                    return_exceptions=True
+                )
+                self._connecting -= missing
+                failed = False
+                for result in results:
+                    if isinstance(result, BaseException):
+                        self.connect_failures += 1
+                        failed = True
+                        logger.warning("Live session pool connect failed: %s", result)
+                    else:
+                        self._idle.append(result)
+                if failed:
+                    await asyncio.sleep(self.RETRY_DELAY)
+                continue
+
+            # Sleep until a session is taken or the oldest one needs replacing
+            timeout = self.max_age
+            if self._idle:
+                timeout = max(0.0, self._idle[0].created_at + self.max_age - time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def average_handshake_seconds(self) -> float:
+        return self._handshake_seconds / self._handshakes if self._handshakes else 0.0
+
+    def stats(self) -> dict:
+        """Snapshot of pool size, hit rate and handshake time saved"""
+        acquired = self.hits + self.misses
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / acquired if acquired else 0.0,
+            "expired": self.expired,
+            "connect_failures": self.connect_failures,
+            "average_handshake_seconds": self.average_handshake_seconds,
+            # Each hit skipped one handshake on the client's critical path
+            "handshake_seconds_saved": self.hits * self.average_handshake_seconds,
+        }
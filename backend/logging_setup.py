@@ -0,0 +1,165 @@
+"""Logging for the backend.
+
+Records are handed to a queue on the event loop and written to stdout by a
+background thread, so logging never blocks audio forwarding on a slow
+terminal or pipe. Every record carries the current session id and turn
+number, and high-frequency events (per audio chunk, per flush) go through a
+Sampler so they can stay enabled at DEBUG without flooding the output.
+
+Environment variables:
+    LOG_LEVEL           DEBUG, INFO (default), WARNING, ...
+    LOG_FORMAT          "text" (default) or "json"
+    LOG_QUEUE_SIZE      records buffered before new ones are dropped (default 10000)
+    LOG_SAMPLE_EVERY    log 1 in N occurrences of a sampled event (default 50)
+    LOG_SAMPLE_MAX_PER_SECOND  cap per sampled event per second, 0 for none (default 5)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+
+LOGGER_NAME = "ellen"
+
+
+class LogContext:
+    """Mutable per-session context attached to every log record"""
+    __slots__ = ("session_id", "turn")
+
+    def __init__(self, session_id: str = "-", turn: int = 0):
+        self.session_id = session_id
+        self.turn = turn
+
+
+# Holds the LogContext of the session the current task is serving. The object is
+# shared (not copied) between a session's tasks, so turn updates are seen by all.
+_log_context = contextvars.ContextVar("log_context", default=LogContext())
+
+
+def bind_session(session_id: str) -> LogContext:
+    """Start a new log context for the current task and those it spawns"""
+    context = LogContext(session_id)
+    _log_context.set(context)
+    return context
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get()
+        record.session_id = context.session_id
+        record.turn = context.turn
+        return True
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "session": record.session_id,
+            "turn": record.turn,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class Sampler:
+    """Decides which occurrences of a high-frequency event are logged"""
+
+    def __init__(self, every_n: int = 1, max_per_second: float = 0):
+        self.every_n = max(1, every_n)
+        self.max_per_second = max_per_second
+        self._counts = {}
+        self._windows = {}
+
+    def allow(self, key: str) -> bool:
+        count = self._counts.get(key, 0) + 1
+        self._counts[key] = count
+        if (count - 1) % self.every_n:
+            return False
+        if self.max_per_second:
+            second = int(time.monotonic())
+            window, used = self._windows.get(key, (second, 0))
+            if window != second:
+                window, used = second, 0
+            if used >= self.max_per_second:
+                return False
+            self._windows[key] = (window, used + 1)
+        return True
+
+
+_listener = None
+_queue_handler = None
+sampler = Sampler()
+
+
+def setup_logging() -> logging.Logger:
+    """Configure the "ellen" logger hierarchy from the environment (idempotent)"""
+    global _listener, _queue_handler
+
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
+        return logger
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    logger.setLevel(level)
+    logger.propagate = False
+
+    sampler.every_n = max(1, int(os.getenv("LOG_SAMPLE_EVERY", "50")))
+    sampler.max_per_second = float(os.getenv("LOG_SAMPLE_MAX_PER_SECOND", "5"))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        stream_handler.setFormatter(_JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [session=%(session_id)s turn=%(turn)s] %(message)s"
+        ))
+
+    _queue_handler = _DroppingQueueHandler(queue.Queue(int(os.getenv("LOG_QUEUE_SIZE", "10000"))))
+    _queue_handler.addFilter(_ContextFilter())
+    logger.addHandler(_queue_handler)
+
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, stream_handler)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return logger
+
+
+def shutdown_logging() -> None:
+    """Write out queued records and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.removeHandler(_queue_handler)
+        if _queue_handler.dropped:
+            print(f"Logging queue overflowed; dropped {_queue_handler.dropped} records", file=sys.stderr)
+
+
+def log_sampled(logger: logging.Logger, level: int, key: str, msg: str, *args) -> None:
+    """Log a high-frequency event, subject to the level and the sampler"""
+    if logger.isEnabledFor(level) and sampler.allow(key):
+        logger.log(level, msg, *args)
@@ -1,16 +1,70 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 import os
 import json
 import base64
 import asyncio
+import time
+import uuid
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import replace
 from google import genai
+from google.genai import types
+from sentiment import StreamingSentiment
+from audio_buffer import OutputAudioBuffer
+from live_pool import LiveSessionPool
+from live_link import LiveLink, UpstreamLost
+from personas import DEFAULT_MODEL, Persona, PersonaRegistry
+from transcript_store import TranscriptStore
+from upstream import UpstreamAudioQueue
+from vad import VoiceActivityDetector
+from codec import FORMAT_ADPCM, FORMAT_PCM16, AudioEncoder, CodecError, decode_audio
+from admission import CLOSE_INTERNAL_ERROR, CLOSE_NORMAL, CLOSE_POLICY_VIOLATION, DRAINING, Rejection, gate
+from logging_setup import bind_session, log_sampled, setup_logging
+from metrics import (
+    REGISTRY,
+    SESSIONS_ACTIVE,
+    SESSIONS_REAPED,
+    SESSIONS_REJECTED,
+    SESSIONS_TOTAL,
+    Gauge,
+    SessionMetrics,
+)
+from protocol import (
+    KIND_INPUT_AUDIO,
+    KIND_OUTPUT_AUDIO,
+    TRANSPORT_BINARY,
+    ProtocolError,
+    SessionOptions,
+    pack_frame,
+    unpack_frame,
+)
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Ellen API")
+logger = setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await live_pool.start()
+    await transcript_store.start()
+    snapshot_task = asyncio.create_task(publish_metrics()) if REGISTRY.multiprocess_dir else None
+    yield
+    await live_pool.close()
+    await transcript_store.close()
+    if snapshot_task is not None:
+        snapshot_task.cancel()
+        await asyncio.gather(snapshot_task, return_exceptions=True)
+        # Counters of this worker stay in /metrics after it exits
+        await asyncio.to_thread(REGISTRY.write_snapshot, REGISTRY.snapshot())
+
+
+app = FastAPI(title="Ellen API", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -21,170 +75,434 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Gemini client for Live API
-gemini_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+# Gemini client for the Live API, created on first use so workers start quickly.
+# GEMINI_FAKE=1 swaps in the local scripted stand-in from fake_live.py for
+# benchmarks; tests can also assign gemini_client.
+gemini_client = None
+
+
+def get_gemini_client():
+    """The process's Gemini client, created the first time a session needs it"""
+    global gemini_client
+    if gemini_client is None:
+        if os.getenv("GEMINI_FAKE"):
+            from fake_live import FakeLiveClient
+            gemini_client = FakeLiveClient.from_env()
+            logger.warning("GEMINI_FAKE is set - using the scripted fake Gemini Live API")
+        else:
+            gemini_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+            logger.info("Gemini client initialized - using Gemini 2.0 Flash for real-time audio")
+    return gemini_client
+
+# Defaults for per-connection settings; clients can override them with session.update
+DEFAULT_SESSION_OPTIONS = SessionOptions(
+    output_frame_samples=int(os.getenv("OUTPUT_FRAME_SAMPLES", "6000")),
+    output_target_latency_ms=int(os.getenv("OUTPUT_TARGET_LATENCY_MS", "250")),
+    vad_mode=os.getenv("VAD_MODE", "off"),
+    vad_threshold_db=int(os.getenv("VAD_THRESHOLD_DB", "-45")),
+    vad_hangover_ms=int(os.getenv("VAD_HANGOVER_MS", "400")),
+    vad_preroll_ms=int(os.getenv("VAD_PREROLL_MS", "200")),
+)
+
+# Mic audio is coalesced into frames of at least UPSTREAM_FRAME_MS before it is sent
+# to Gemini; at most UPSTREAM_MAX_QUEUE_MS of audio waits in the upstream queue
+INPUT_BYTES_PER_MS = 32  # 16kHz PCM16
+UPSTREAM_FRAME_MS = int(os.getenv("UPSTREAM_FRAME_MS", "40"))
+UPSTREAM_MAX_QUEUE_MS = int(os.getenv("UPSTREAM_MAX_QUEUE_MS", "2000"))
+UPSTREAM_QUEUE_POLICY = os.getenv("UPSTREAM_QUEUE_POLICY", "drop_oldest")
+
+# Upstream queues of the sessions currently open, for /metrics
+active_upstream_queues = set()
+
+# Sessions this process serves at once (0 for no limit); over the limit clients are
+# turned away with close code 1013. Sessions with no conversation activity (speech,
+# AI responses or control events; with VAD_MODE=off any mic audio) for
+# SESSION_IDLE_TIMEOUT seconds are closed.
+gate.max_sessions = int(os.getenv("MAX_SESSIONS_PER_WORKER", "0"))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "300"))
+# While draining, a session is closed once nothing has happened for this long
+DRAIN_QUIET_SECONDS = 2.0
+
+# Transcription is not ordered with model audio, so a fragment of the user's own
+# utterance can arrive after the AI started answering. Without the server VAD seeing a
+# new onset, a fragment only counts as barge-in this long after the response started.
+# That is only a time check: with the VAD off, transcribed echo of the AI's own voice
+# (no headphones, no browser echo cancellation) can still interrupt it.
+BARGE_IN_GRACE_MS = int(os.getenv("BARGE_IN_GRACE_MS", "1000"))
+
+
+# Transparent resumption, which also reports the last client message each resumption
+# handle covers, is only available on Vertex AI (see live_link.py)
+LIVE_RESUMPTION_TRANSPARENT = os.getenv("LIVE_RESUMPTION_TRANSPARENT", "").lower() in ("1", "true")
+# Mic audio kept for replay after a reconnect
+UPSTREAM_REPLAY_MS = int(os.getenv("UPSTREAM_REPLAY_MS", "5000"))
+
+# Voices, models and system prompts clients can pick per connection, with their Live
+# session configs built once here rather than for every connection
+personas = PersonaRegistry(
+    model=os.getenv("LIVE_MODEL", DEFAULT_MODEL),
+    transparent_resumption=LIVE_RESUMPTION_TRANSPARENT,
+)
+
+
+def connect_live_session(persona: Persona, handle=None):
+    """Open a new Gemini Live session, resuming `handle` if given (async context manager)"""
+    return get_gemini_client().aio.live.connect(model=persona.model, config=persona.connect_config(handle))
+
+
+# Pre-connected Live sessions of the default persona handed to new clients; disabled
+# when LIVE_POOL_SIZE is 0. Other personas connect when a client asks for them.
+# LIVE_POOL_SIZE is the total for the server: serve.py's worker processes (WEB_CONCURRENCY)
+# each keep their share, rounded up.
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+live_pool = LiveSessionPool(
+    lambda: connect_live_session(personas.default),
+    size=-(-int(os.getenv("LIVE_POOL_SIZE", "0")) // WORKER_COUNT),
+    max_age=float(os.getenv("LIVE_POOL_MAX_AGE", "120")),
+)
 
-print("Gemini client initialized - using Gemini 2.0 Flash for real-time audio")
 
+def collect_pool_metrics():
+    """Expose the Live session pool statistics as gauges at scrape time"""
+    for key, value in live_pool.stats().items():
+        gauge = Gauge(f"ellen_live_pool_{key}", f"Live session pool {key.replace('_', ' ')}")
+        gauge.set(value)
+        yield gauge
 
-SYSTEM_PROMPT = """You are 'Ellen', a warm, wise, and empathetic British friend designed to provide caring support and companionship.
 
-CRITICAL: Listen carefully to what the user ACTUALLY says. Do not make up topics or context that wasn't mentioned. Respond ONLY to what they tell you.
+def collect_upstream_queue_metrics():
+    """Total audio waiting in upstream queues across open sessions"""
+    gauge = Gauge("ellen_upstream_queue_bytes", "Mic audio bytes waiting to be sent to Gemini")
+    gauge.set(sum(queue.depth_bytes for queue in active_upstream_queues))
+    yield gauge
+
+
+# Completed turns of every conversation; persisted as JSON Lines under TRANSCRIPT_DIR
+# (memory only when unset), in files rotated at TRANSCRIPT_MAX_MB
+transcript_store = TranscriptStore(
+    os.getenv("TRANSCRIPT_DIR", ""),
+    ring_turns=int(os.getenv("TRANSCRIPT_RING_TURNS", "50")),
+    max_sessions=int(os.getenv("TRANSCRIPT_MAX_SESSIONS", "1000")),
+    max_bytes=int(float(os.getenv("TRANSCRIPT_MAX_MB", "10")) * 1024 * 1024),
+    max_files=int(os.getenv("TRANSCRIPT_MAX_FILES", "10")),
+    history_files=int(os.getenv("TRANSCRIPT_HISTORY_FILES", "3")),
+)
+
 
-Your tone should be comforting, non-judgmental, validating, and casually conversational with a gentle British manner.
-Use British English spellings (favour, colour, realise, etc.) but avoid overly familiar terms of endearment like 'love', 'dear', or 'pet'.
-Avoid overly clinical language unless asked. Focus on emotional support and practical, gentle advice.
+def collect_transcript_metrics():
+    """Expose the transcript store statistics as gauges at scrape time"""
+    for key, value in transcript_store.stats().items():
+        gauge = Gauge(f"ellen_transcript_{key}", f"Transcript store {key.replace('_', ' ')}")
+        gauge.set(value)
+        yield gauge
 
-When someone says they're not feeling well, not feeling great, or not feeling their best - recognize this as NEGATIVE sentiment and respond with empathy and support.
 
-IMPORTANT: The user speaks English. Always interpret their speech as English."""
+REGISTRY.add_collector(collect_pool_metrics)
+REGISTRY.add_collector(collect_upstream_queue_metrics)
+REGISTRY.add_collector(collect_transcript_metrics)
+
+# With several workers (set by serve.py), each one publishes its metrics here every
+# METRICS_SNAPSHOT_SECONDS and /metrics on any worker reports all of them
+REGISTRY.multiprocess_dir = os.getenv("METRICS_MULTIPROC_DIR") or None
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "5"))
+
+
+async def publish_metrics():
+    """Write this worker's metrics snapshot for the other workers' /metrics"""
+    while True:
+        try:
+            await asyncio.to_thread(REGISTRY.write_snapshot, REGISTRY.snapshot())
+        except OSError as e:
+            log_sampled(logger, logging.WARNING, "metrics_snapshot", "Could not write metrics snapshot: %s", e)
+        await asyncio.sleep(METRICS_SNAPSHOT_SECONDS)
 
 
 @app.get("/")
 async def root():
-    return {"message": "Ellen API is running"}
-
-
-def analyze_sentiment(text: str) -> str:
-    """Enhanced sentiment analysis based on keywords and phrases with negation handling"""
-    text_lower = text.lower()
-
-    # Positive keywords
-    positive_words = [
-        'happy', 'great', 'good', 'better', 'wonderful', 'excited', 'glad',
-        'relieved', 'thankful', 'grateful', 'love', 'excellent', 'amazing',
-        'fantastic', 'joy', 'pleased', 'delighted', 'blessed', 'fortunate',
-        'perfect', 'brilliant', 'awesome', 'super', 'proud', 'hopeful'
-    ]
-
-    # Negative keywords - expanded significantly
-    negative_words = [
-        'sad', 'bad', 'worse', 'awful', 'terrible', 'angry', 'frustrated',
-        'anxious', 'worried', 'pain', 'hurt', 'difficult', 'hard', 'struggling',
-        'depressed', 'upset', 'problem', 'issue', 'trouble', 'concern', 'stress',
-        'overwhelm', 'exhaust', 'tire', 'sick', 'ill', 'uncomfortable', 'scary',
-        'fear', 'afraid', 'nervous', 'tense', 'irritable', 'annoyed', 'miserable',
-        'hopeless', 'helpless', 'lonely', 'isolated', 'crying', 'tears', 'suffer',
-        'ache', 'sore', 'insomnia', 'sleepless', 'fatigue', 'weary', 'drained',
-        'nausea', 'dizzy', 'headache', 'migraine', 'cramp', 'sweat', 'hot flash',
-        'mood swing', 'irritat', 'anger', 'rage', 'panic', 'attack', 'unable',
-        'can\'t', 'cannot', 'won\'t', 'fail', 'loss', 'lost', 'gone', 'missing'
-    ]
-
-    # Negation words
-    negations = ['not', 'no', 'never', 'don\'t', 'dont', 'doesn\'t', 'doesnt', 'didn\'t', 'didnt', 'isn\'t', 'isnt', 'aren\'t', 'arent']
-
-    # Strong negative phrases (MUST CHECK FIRST - highest priority to catch negations)
-    strong_negative_phrases = [
-        'don\'t feel good', 'dont feel good', 'not feeling good', 'not feeling well',
-        'don\'t feel well', 'dont feel well', 'not feel good', 'not feel well',
-        'not feeling great', 'not feeling my best', 'not feeling the best',
-        'not feeling best', 'not my best',
-        'feel bad', 'feel awful', 'feel terrible', 'feeling bad', 'feeling awful',
-        'bad day', 'terrible day', 'awful day', 'not good', 'not great', 'not well',
-        'having trouble', 'having problems', 'having issues', 'can\'t sleep',
-        'unable to sleep', 'sleep problem', 'sleep issue', 'waking up', 'night sweat',
-        'weight gain', 'weight loss', 'no energy', 'not happy',
-        # Physical pain phrases
-        'sore back', 'back pain', 'back hurts', 'my back', 'bad back', 'hurt my back',
-        'sore neck', 'neck pain', 'headache', 'migraine', 'in pain', 'feeling pain',
-        'hurts', 'aching', 'stiff', 'pulled a muscle', 'muscle pain',
-        # Illness phrases
-        'have a cold', 'got a cold', 'caught a cold', 'feeling sick', 'feel sick',
-        'under the weather', 'not well', 'unwell', 'flu', 'fever', 'cough',
-        'runny nose', 'blocked nose', 'stuffy', 'sneezing', 'sore throat'
-    ]
-
-    # Strong positive phrases (check AFTER negatives to avoid false positives)
-    strong_positive_phrases = [
-        'feel better', 'feeling better', 'feel great', 'feeling great',
-        'feel wonderful', 'feeling wonderful', 'feel amazing', 'feeling amazing',
-        'so happy', 'very happy', 'really happy', 'feeling good'
-    ]
-
-    # Check for strong negative phrases FIRST (to catch negations like "don't feel good")
-    for phrase in strong_negative_phrases:
-        if phrase in text_lower:
-            return "NEGATIVE"
-
-    # Check for strong positive phrases AFTER negatives
-    for phrase in strong_positive_phrases:
-        if phrase in text_lower:
-            return "POSITIVE"
-
-    # Check for negations before positive words (e.g., "not happy", "don't feel good")
-    for negation in negations:
-        for positive_word in positive_words:
-            if f"{negation} {positive_word}" in text_lower or f"{negation} feel {positive_word}" in text_lower:
-                return "NEGATIVE"
-
-    positive_count = sum(1 for word in positive_words if word in text_lower)
-    negative_count = sum(1 for word in negative_words if word in text_lower)
-
-    # Default to NEUTRAL for very short messages or greetings
-    if len(text_lower.strip()) < 5 or text_lower.strip() in ['hi', 'hello', 'hey', 'yes', 'no', 'ok', 'okay']:
-        return "NEUTRAL"
-
-    if positive_count > negative_count:
-        return "POSITIVE"
-    elif negative_count > positive_count:
-        return "NEGATIVE"
-    else:
-        return "NEUTRAL"
+    response = {"message": "Ellen API is running", "personas": personas.names}
+    if live_pool.size:
+        # The pool of the worker that answered; /metrics has every worker's
+        response["session_pool"] = {"worker": os.getpid(), **live_pool.stats()}
+    if gate.draining:
+        # Tell load balancers to stop sending clients here
+        response["message"] = "Ellen API is draining"
+        return JSONResponse(response, status_code=503)
+    return response
+
+
+@app.get("/metrics")
+async def metrics():
+    snapshots = await asyncio.to_thread(REGISTRY.read_snapshots)
+    return PlainTextResponse(REGISTRY.render(snapshots), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/history/{session_id}")
+async def history(session_id: str, limit: int = 20):
+    """Most recent turns of a realtime conversation, oldest first"""
+    # Ids are uuid4().hex; anything else is unknown without touching the disk
+    if len(session_id) != 32 or session_id.strip("0123456789abcdef"):
+        raise HTTPException(status_code=404, detail="Unknown session")
+    turns = await transcript_store.history(session_id, max(0, min(limit, transcript_store.ring_turns)))
+    if turns is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"session_id": session_id, "turns": turns}
 
 
 @app.websocket("/ws/realtime")
 async def websocket_realtime(websocket: WebSocket):
     """WebSocket endpoint for Gemini Live API"""
-    import sys
-    from google.genai import types
+    # Clients read the conversation back from /history/<id>; logs show the first 8 characters
+    session_id = uuid.uuid4().hex
+    log_context = bind_session(session_id[:8])
 
     await websocket.accept()
-    print("Client WebSocket accepted", flush=True)
-    sys.stdout.flush()
 
-    try:
-        # Prepare system instructions for Gemini
-        system_instruction = SYSTEM_PROMPT
-
-        print("Connecting to Gemini Live API...", flush=True)
-        sys.stdout.flush()
-
-        # Connect to Gemini Live API
-        config = types.LiveConnectConfig(
-            response_modalities=["AUDIO"],
-            speech_config=types.SpeechConfig(
-                voice_config=types.VoiceConfig(
-                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Aoede")
-                )
-            ),
-            output_audio_transcription=types.AudioTranscriptionConfig(),
-            input_audio_transcription=types.AudioTranscriptionConfig(),
-            system_instruction=system_instruction
+    # Turn the client away before any Gemini session is opened for it
+    persona = personas.get(websocket.query_params.get("persona"))
+    if persona is None:
+        rejection = Rejection(
+            "unknown_persona",
+            f"Unknown persona, choose one of: {', '.join(personas.names)}",
+            CLOSE_POLICY_VIOLATION
         )
+    else:
+        rejection = gate.admit()
+    if rejection is not None:
+        logger.warning("Rejecting session: %s (%d active)", rejection.reason, gate.active)
+        SESSIONS_REJECTED.labels(reason=rejection.reason).inc()
+        try:
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "error": {"code": rejection.reason, "message": rejection.message}
+            }))
+            await websocket.close(code=rejection.close_code)
+        except Exception:
+            pass
+        return
 
-        async with gemini_client.aio.live.connect(model="models/gemini-2.0-flash-exp", config=config) as session:
-            print("Connected to Gemini Live API!", flush=True)
-            sys.stdout.flush()
+    logger.info("Client WebSocket accepted (persona %s)", persona.name)
+    session_metrics = SessionMetrics()
+    SESSIONS_TOTAL.inc()
+    SESSIONS_ACTIVE.inc()
 
-            # Audio buffering variables
-            audio_buffer = []
-            buffer_sample_count = 0
-            BUFFER_THRESHOLD = 6000  # ~250ms at 24kHz sample rate
+    try:
+        logger.info("Connecting to Gemini Live API...")
+
+        # Take a pre-connected session from the pool, or connect now if it is empty or the
+        # client asked for another persona; if the upstream drops later, the link resumes
+        # it on a new connection
+        first_session = live_pool.acquire() if persona is personas.default else connect_live_session(persona)
+        async with LiveLink(
+            first_session,
+            lambda handle: connect_live_session(persona, handle),
+            replay_limit=UPSTREAM_REPLAY_MS * INPUT_BYTES_PER_MS,
+            on_reconnect=session_metrics.upstream_reconnected,
+            transparent=LIVE_RESUMPTION_TRANSPARENT
+        ) as session:
+            logger.info("Connected to Gemini Live API!")
 
             # Track turn state
             turn_count = [0]
 
+            # Last sign of an ongoing conversation, for idle reaping and draining
+            last_activity = [time.monotonic()]
+
+            def mark_activity():
+                last_activity[0] = time.monotonic()
+
+            # Without the server VAD, speech can't be told from silence, so any mic audio
+            # keeps the session from being reaped as idle (but does not hold up a drain)
+            last_mic_audio = [last_activity[0]]
+
+            # Negotiated per-connection settings (audio transport etc.)
+            session_options = replace(DEFAULT_SESSION_OPTIONS)
+
+            # Output audio waiting to be sent to the client
+            output_buffer = OutputAudioBuffer(
+                session_options.output_frame_samples,
+                session_options.output_target_latency_ms
+            )
+
+            # Encodes AI audio in the client's negotiated output format
+            output_encoder = AudioEncoder(session_options.output_audio_format)
+
+            # Track WebSocket state
+            ws_open = [True]
+
+            async def safe_send(msg):
+                """Send message only if WebSocket is still open"""
+                if ws_open[0]:
+                    try:
+                        await websocket.send_text(json.dumps(msg))
+                        return True
+                    except Exception as e:
+                        logger.warning("Send failed, marking WS closed: %s", e)
+                        session_metrics.send_failed("client")
+                        ws_open[0] = False
+                        return False
+                return False
+
+            async def safe_send_bytes(frame):
+                """Send a binary frame only if WebSocket is still open"""
+                if ws_open[0]:
+                    try:
+                        await websocket.send_bytes(frame)
+                        return True
+                    except Exception as e:
+                        logger.warning("Send failed, marking WS closed: %s", e)
+                        session_metrics.send_failed("client")
+                        ws_open[0] = False
+                        return False
+                return False
+
+            await safe_send({
+                "type": "session.created",
+                "session": {"id": session_id, "persona": persona.name, **session_options.describe()}
+            })
+
+            # Mic audio waiting to be sent to Gemini
+            upstream_queue = UpstreamAudioQueue(
+                frame_bytes=UPSTREAM_FRAME_MS * INPUT_BYTES_PER_MS,
+                max_bytes=UPSTREAM_MAX_QUEUE_MS * INPUT_BYTES_PER_MS,
+                policy=UPSTREAM_QUEUE_POLICY,
+                max_delay=UPSTREAM_FRAME_MS / 1000,
+                on_drop=session_metrics.upstream_dropped
+            )
+            active_upstream_queues.add(upstream_queue)
+
+            # Decides which mic audio is worth sending to Gemini at all
+            vad = VoiceActivityDetector(
+                session_options.vad_mode,
+                session_options.vad_threshold_db,
+                session_options.vad_hangover_ms,
+                session_options.vad_preroll_ms
+            )
+
+            # Barge-in: once the user interrupts, the rest of the AI response is discarded
+            response_active = [False]  # model audio of the current turn has started
+            response_started_at = [0.0]
+            speech_onset_at = [None]  # last speech onset seen by the server VAD
+            discarding_response = [False]
+            discarded_bytes = [0]
+
+            def interrupt_response(source):
+                """Stop sending the in-flight AI response to the client"""
+                if not response_active[0] or discarding_response[0]:
+                    return
+                discarding_response[0] = True
+                discarded_bytes[0] = output_buffer.clear()
+                session_metrics.interrupted(source)
+                # With automatic activity detection Gemini has no explicit cancel; get the
+                # barge-in audio to it without waiting for a full frame so its VAD stops the turn
+                upstream_queue.flush()
+                logger.info("AI response interrupted (%s)", source)
+
+            def end_interruption():
+                """The interrupted response is over; forward model audio again"""
+                response_active[0] = False
+                if discarding_response[0]:
+                    discarding_response[0] = False
+                    session_metrics.interruption_ended(discarded_bytes[0])
+                    logger.info("Interruption kept %d bytes of AI audio from being sent", discarded_bytes[0])
+
+            async def send_to_gemini():
+                """Send queued audio frames to Gemini"""
+                try:
+                    while True:
+                        frame = await upstream_queue.get()
+                        if frame is None:
+                            break
+                        # Send to Gemini using send_realtime_input
+                        try:
+                            if not frame:
+                                # The VAD stopped forwarding silence; let Gemini's VAD close the turn
+                                await session.send_realtime_input(audio_stream_end=True)
+                                continue
+                            await session.send_realtime_input(
+                                audio=types.Blob(mime_type="audio/pcm", data=frame)
+                            )
+                            session_metrics.upstream_audio(len(frame), upstream_queue.depth_bytes)
+                        except UpstreamLost:
+                            # forward_to_client ends the session; don't reconnect per frame
+                            break
+                        except Exception as send_err:
+                            session_metrics.send_failed("upstream")
+                            log_sampled(logger, logging.WARNING, "upstream_send_error", "Error sending to Gemini: %s", send_err)
+                finally:
+                    logger.debug("send_to_gemini task ended!")
+
             async def forward_to_gemini():
-                """Forward audio from client to Gemini"""
+                """Forward audio from client to the upstream queue"""
                 audio_chunk_count = 0
+                input_seq = [0]
+
+                async def send_audio_upstream(audio_bytes):
+                    nonlocal audio_chunk_count
+                    audio_chunk_count += 1
+
+                    # Sampled to avoid spam but show audio is flowing
+                    log_sampled(logger, logging.DEBUG, "client_audio", "Audio chunk #%d (%d bytes)", audio_chunk_count, len(audio_bytes))
+
+                    # Gemini takes PCM16 whatever the client sends
+                    input_format = session_options.input_audio_format
+                    if input_format != FORMAT_PCM16:
+                        encoded_size = len(audio_bytes)
+                        try:
+                            if input_format == FORMAT_ADPCM:
+                                # Per-message work in NumPy; keep it off the event loop
+                                audio_bytes = await asyncio.to_thread(decode_audio, input_format, audio_bytes)
+                            else:
+                                audio_bytes = decode_audio(input_format, audio_bytes)
+                        except CodecError as e:
+                            log_sampled(logger, logging.WARNING, "bad_audio", "Dropping %s audio: %s", input_format, e)
+                            return
+                        session_metrics.transcoded("in", len(audio_bytes), encoded_size)
+
+                    if vad.mode == "off":
+                        last_mic_audio[0] = time.monotonic()
+                    was_in_speech = vad.in_speech
+                    chunks, stream_ended = vad.process(audio_bytes)
+                    if vad.in_speech:
+                        mark_activity()
+                        if not was_in_speech:
+                            speech_onset_at[0] = time.monotonic()
+                    for chunk in chunks:
+                        await upstream_queue.put(chunk)
+                    if stream_ended:
+                        upstream_queue.end_stream()
+                        session_metrics.vad_stream_ended()
+                        logger.debug("VAD: speech ended, %.0f%% of mic audio suppressed so far", vad.suppressed_fraction * 100)
+                    session_metrics.vad(vad.forwarded_bytes, vad.suppressed_bytes)
+
                 try:
-                    print("forward_to_gemini: Starting to listen for client audio...", flush=True)
+                    logger.debug("forward_to_gemini: Starting to listen for client audio...")
                     while True:
-                        # Receive from client
-                        data = await websocket.receive_text()
-                        message = json.loads(data)
+                        # Receive from client (text or binary frame)
+                        frame = await websocket.receive()
+                        if frame["type"] == "websocket.disconnect":
+                            raise WebSocketDisconnect(frame.get("code", 1000))
+
+                        # Binary frames carry raw PCM16 audio
+                        if frame.get("bytes") is not None:
+                            try:
+                                kind, seq, audio_bytes = unpack_frame(frame["bytes"])
+                            except ProtocolError as e:
+                                log_sampled(logger, logging.WARNING, "bad_frame", "Dropping binary frame: %s", e)
+                                continue
+                            if kind != KIND_INPUT_AUDIO:
+                                log_sampled(logger, logging.WARNING, "bad_frame", "Dropping binary frame of unexpected kind %d", kind)
+                                continue
+                            if seq != (input_seq[0] + 1) & 0xFFFFFFFF:
+                                log_sampled(logger, logging.WARNING, "sequence_gap", "Binary audio sequence gap: expected %d, got %d", input_seq[0] + 1, seq)
+                            input_seq[0] = seq
+                            if audio_bytes:
+                                await send_audio_upstream(audio_bytes)
+                            continue
+
+                        message = json.loads(frame["text"])
                         msg_type = message.get("type")
+                        if msg_type != "input_audio_buffer.append":
+                            mark_activity()
 
                         # Handle different message types
                         if msg_type == "input_audio_buffer.append":
@@ -192,185 +510,289 @@ async def websocket_realtime(websocket: WebSocket):
                             audio_b64 = message.get("audio")
                             if audio_b64:
                                 # Decode base64 to bytes
-                                audio_bytes = base64.b64decode(audio_b64)
-                                audio_chunk_count += 1
-
-                                # Log every 50 chunks to avoid spam but show audio is flowing
-                                if audio_chunk_count % 50 == 0:
-                                    print(f"Audio chunk #{audio_chunk_count} ({len(audio_bytes)} bytes) - Turn {turn_count[0]}", flush=True)
-
-                                # Send to Gemini using send_realtime_input
-                                try:
-                                    await session.send_realtime_input(
-                                        audio=types.Blob(mime_type="audio/pcm", data=audio_bytes)
-                                    )
-                                except Exception as send_err:
-                                    print(f"Error sending to Gemini: {send_err}", flush=True)
+                                await send_audio_upstream(base64.b64decode(audio_b64))
+
+                        elif msg_type == "session.update":
+                            try:
+                                session_options.apply_update(message.get("session"))
+                            except ProtocolError as e:
+                                await safe_send({"type": "error", "error": {"message": str(e)}})
+                                continue
+                            output_buffer.configure(
+                                session_options.output_frame_samples,
+                                session_options.output_target_latency_ms
+                            )
+                            if output_encoder.format != session_options.output_audio_format:
+                                output_encoder.configure(session_options.output_audio_format)
+                            vad.configure(
+                                session_options.vad_mode,
+                                session_options.vad_threshold_db,
+                                session_options.vad_hangover_ms,
+                                session_options.vad_preroll_ms
+                            )
+                            logger.info("Session updated: %s", session_options.describe())
+                            await safe_send({"type": "session.updated", "session": session_options.describe()})
 
                         elif msg_type == "input_audio_buffer.commit":
-                            print("Turn end detected - waiting for Gemini's VAD to trigger response", flush=True)
+                            session_metrics.speech_ended()
+                            # Don't hold the last partial frame back at the end of speech
+                            upstream_queue.flush()
+                            logger.debug("Turn end detected - waiting for Gemini's VAD to trigger response")
 
                         elif msg_type == "response.cancel":
-                            print("User interrupted AI response", flush=True)
+                            logger.info("User interrupted AI response")
+                            interrupt_response("client")
 
                 except WebSocketDisconnect:
-                    print("Client disconnected", flush=True)
+                    logger.info("Client disconnected")
                 except Exception as e:
-                    print(f"Error forwarding to Gemini: {e}", flush=True)
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception("Error forwarding to Gemini: %s", e)
                 finally:
-                    print("forward_to_gemini task ended!", flush=True)
-
-            # Track WebSocket state
-            ws_open = [True]
+                    upstream_queue.close()
+                    logger.debug("forward_to_gemini task ended!")
 
             async def forward_to_client():
                 """Forward messages from Gemini to client"""
-                # Audio buffering variables (local to this function)
-                audio_buffer_local = []
-                buffer_sample_count_local = 0
                 # Transcript accumulators
                 ai_transcript_parts = []
                 user_transcript_parts = []
                 user_transcript_sent = [False]  # Track if we've sent the user transcript for this turn
                 speech_started_sent = [False]  # Track if we've notified frontend about user speaking
-
-                async def safe_send(msg):
-                    """Send message only if WebSocket is still open"""
-                    if ws_open[0]:
-                        try:
-                            await websocket.send_text(json.dumps(msg))
-                            return True
-                        except Exception as e:
-                            print(f"Send failed, marking WS closed: {e}", flush=True)
-                            ws_open[0] = False
-                            return False
-                    return False
+                turn_sentiment = [None]  # Sentiment of the user's words this turn, for the transcript
+
+                # Sentiment follows the user's transcription as it arrives; changes are sent
+                # as provisional updates until the AI starts answering
+                sentiment_tracker = StreamingSentiment()
+                sentiment_seconds = [0.0]
+                provisional_sentiment = ["NEUTRAL"]
+                output_seq = [0]
+
+                async def send_audio_delta(audio_bytes):
+                    """Send an audio chunk using the negotiated format and transport"""
+                    if output_encoder.format != FORMAT_PCM16:
+                        pcm_size = len(audio_bytes)
+                        if output_encoder.format == FORMAT_ADPCM:
+                            # ADPCM encoding is sample by sample; run it off the event loop
+                            # (flushes are serialized by output_send_lock, so its state is safe)
+                            audio_bytes = await asyncio.to_thread(output_encoder.encode, audio_bytes)
+                        else:
+                            audio_bytes = output_encoder.encode(audio_bytes)
+                        session_metrics.transcoded("out", pcm_size, len(audio_bytes))
+                    if session_options.audio_transport == TRANSPORT_BINARY:
+                        output_seq[0] += 1
+                        return await safe_send_bytes(pack_frame(KIND_OUTPUT_AUDIO, output_seq[0], audio_bytes))
+                    return await safe_send({
+                        "type": "response.audio.delta",
+                        "delta": base64.b64encode(audio_bytes).decode('utf-8')
+                    })
+
+                output_send_lock = asyncio.Lock()
+                deadline_flush_task = [None]
+
+                async def flush_output_audio(reason):
+                    """Send everything in the output buffer; returns False once the socket is gone"""
+                    async with output_send_lock:
+                        if not output_buffer:
+                            # Nothing to send; reset the deadline so flush_at_deadline stops
+                            output_buffer.clear()
+                            return ws_open[0]
+                        audio_bytes = output_buffer.take()
+                        sent = await send_audio_delta(audio_bytes)
+                    if sent:
+                        session_metrics.flushed(reason, len(audio_bytes))
+                    return sent
+
+                async def flush_at_deadline():
+                    """Flush buffered audio once it has waited for the target latency"""
+                    while True:
+                        deadline = output_buffer.deadline
+                        if deadline is None:
+                            return
+                        delay = deadline - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                            continue
+                        samples = output_buffer.samples
+                        if not await flush_output_audio("deadline"):
+                            return
+                        log_sampled(logger, logging.DEBUG, "flush", "Flushed audio buffer on deadline: %d samples", samples)
+
+                def is_new_speech(text):
+                    """Whether a transcription fragment shows the user talking over the response"""
+                    if not text or text.isspace():
+                        return False
+                    if vad.mode != "off":
+                        # The server VAD heard a new utterance start during the response
+                        return speech_onset_at[0] is not None and speech_onset_at[0] > response_started_at[0]
+                    return time.monotonic() - response_started_at[0] >= BARGE_IN_GRACE_MS / 1000
+
+                def schedule_deadline_flush():
+                    """Make sure the tail of a slow stream is not held back"""
+                    if deadline_flush_task[0] is None or deadline_flush_task[0].done():
+                        deadline_flush_task[0] = asyncio.create_task(flush_at_deadline())
 
                 try:
-                    print("forward_to_client: Starting to listen for Gemini responses...", flush=True)
-                    # Keep receiving in a loop - session.receive() may end after each turn
+                    logger.debug("forward_to_client: Starting to listen for Gemini responses...")
+                    # Keep receiving in a loop - session.receive() ends after each turn;
+                    # upstream drops are handled (and resumed) inside the LiveLink
                     while True:
-                        print("Starting new receive loop iteration...", flush=True)
+                        logger.debug("Starting new receive loop iteration...")
                         async for response in session.receive():
                             # Log full response structure to debug transcription
                             if hasattr(response, 'server_content') and response.server_content:
                                 sc = response.server_content
                                 if hasattr(sc, 'input_transcription') and sc.input_transcription:
-                                    print(f"Input transcription found: {sc.input_transcription}", flush=True)
+                                    log_sampled(logger, logging.DEBUG, "transcription", "Input transcription found: %s", sc.input_transcription)
                                 if hasattr(sc, 'output_transcription') and sc.output_transcription:
-                                    print(f"Output transcription found: {sc.output_transcription}", flush=True)
+                                    log_sampled(logger, logging.DEBUG, "transcription", "Output transcription found: %s", sc.output_transcription)
 
                             # Handle different response types
                             if response.server_content:
+                                mark_activity()
                                 if response.server_content.model_turn and response.server_content.model_turn.parts:
                                     for part in response.server_content.model_turn.parts:
                                         # Handle audio output
                                         if part.inline_data:
+                                            # The rest of an interrupted response is not sent
+                                            if discarding_response[0]:
+                                                discarded_bytes[0] += len(part.inline_data.data)
+                                                continue
+                                            if not response_active[0]:
+                                                response_started_at[0] = time.monotonic()
+                                            response_active[0] = True
+
                                             # When AI starts responding, send accumulated user transcript
                                             if user_transcript_parts and not user_transcript_sent[0]:
                                                 full_user_transcript = ''.join(user_transcript_parts)
-                                                print(f"User full transcript: {full_user_transcript}", flush=True)
+                                                logger.debug("User full transcript: %s", full_user_transcript)
                                                 user_transcript_msg = {
                                                     "type": "conversation.item.input_audio_transcription.completed",
                                                     "transcript": full_user_transcript
                                                 }
                                                 await safe_send(user_transcript_msg)
 
-                                                # Analyze sentiment and send update
-                                                sentiment = analyze_sentiment(full_user_transcript)
-                                                print(f"Sentiment analyzed: {sentiment}", flush=True)
+                                                # Sentiment is already up to date with the transcript
+                                                sentiment = sentiment_tracker.sentiment
+                                                session_metrics.sentiment(sentiment_seconds[0])
+                                                logger.info("Sentiment analyzed: %s", sentiment)
+                                                turn_sentiment[0] = sentiment
                                                 sentiment_msg = {
                                                     "type": "sentiment.update",
-                                                    "sentiment": sentiment
+                                                    "sentiment": sentiment,
+                                                    "provisional": False
                                                 }
                                                 await safe_send(sentiment_msg)
 
                                                 user_transcript_sent[0] = True
 
+                                            session_metrics.first_model_audio()
                                             audio_bytes = part.inline_data.data
-                                            print(f"Got audio chunk: {len(audio_bytes)} bytes", flush=True)
-                                            # Convert to base64 for client
-                                            audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
-
-                                            # Buffer audio chunks
-                                            audio_buffer_local.append(audio_b64)
-                                            buffer_sample_count_local += len(audio_bytes) // 2  # PCM16 = 2 bytes per sample
-
-                                            # If buffer is full, flush it
-                                            if buffer_sample_count_local >= BUFFER_THRESHOLD:
-                                                combined_audio = ''.join(audio_buffer_local)
-                                                buffered_msg = {
-                                                    "type": "response.audio.delta",
-                                                    "delta": combined_audio
-                                                }
-                                                try:
-                                                    await websocket.send_text(json.dumps(buffered_msg))
-                                                    print(f"Flushed audio buffer: {buffer_sample_count_local} samples", flush=True)
-                                                except RuntimeError as e:
-                                                    print(f"WebSocket closed, stopping audio send: {e}", flush=True)
-                                                    return
+                                            log_sampled(logger, logging.DEBUG, "model_audio", "Got audio chunk: %d bytes", len(audio_bytes))
 
-                                                # Reset buffer
-                                                audio_buffer_local.clear()
-                                                buffer_sample_count_local = 0
+                                            # Buffer raw PCM; it is encoded once per flush
+                                            output_buffer.write(audio_bytes)
+
+                                            # If buffer is full, flush it, otherwise flush by the deadline
+                                            if output_buffer.is_full:
+                                                samples = output_buffer.samples
+                                                if not await flush_output_audio("threshold"):
+                                                    logger.info("WebSocket closed, stopping audio send")
+                                                    return
+                                                log_sampled(logger, logging.DEBUG, "flush", "Flushed audio buffer: %d samples", samples)
+                                            else:
+                                                schedule_deadline_flush()
 
                             # Handle AI output transcription (from output_transcription, not part.text)
                             if response.server_content and response.server_content.output_transcription:
                                 text_part = response.server_content.output_transcription.text
-                                if text_part:
+                                if text_part and not discarding_response[0]:
                                     ai_transcript_parts.append(text_part)
 
                             # Handle user speech transcription - accumulate chunks
                             if response.server_content and response.server_content.input_transcription:
-                                # Only send interrupt signal if AI is currently responding (user_transcript already sent)
-                                # This means user is interrupting the AI, not just speaking for the first time
-                                if user_transcript_sent[0] and not speech_started_sent[0]:
-                                    speech_msg = {"type": "input_audio_buffer.speech_started"}
-                                    await safe_send(speech_msg)
-                                    speech_started_sent[0] = True
-                                    print("User interrupting AI - sent interrupt signal", flush=True)
-
                                 user_transcript = response.server_content.input_transcription.text
+
+                                # Only send interrupt signal if AI is currently responding (user_transcript already sent)
+                                # and the fragment is new speech, not late transcription of the user's last words
+                                if user_transcript_sent[0] and is_new_speech(user_transcript):
+                                    if not speech_started_sent[0]:
+                                        speech_msg = {"type": "input_audio_buffer.speech_started"}
+                                        await safe_send(speech_msg)
+                                        speech_started_sent[0] = True
+                                        logger.info("User interrupting AI - sent interrupt signal")
+                                    interrupt_response("speech")
                                 if user_transcript:
                                     user_transcript_parts.append(user_transcript)
+                                    # Until the model answers, the latest fragment approximates the end of speech
+                                    if not user_transcript_sent[0]:
+                                        session_metrics.speech_ended()
+                                        started = time.perf_counter()
+                                        sentiment = sentiment_tracker.feed(user_transcript)
+                                        sentiment_seconds[0] += time.perf_counter() - started
+                                        if sentiment != provisional_sentiment[0]:
+                                            provisional_sentiment[0] = sentiment
+                                            logger.debug("Provisional sentiment: %s", sentiment)
+                                            await safe_send({
+                                                "type": "sentiment.update",
+                                                "sentiment": sentiment,
+                                                "provisional": True
+                                            })
+
+                            # Gemini's own VAD heard the user and stopped generating
+                            if response.server_content and response.server_content.interrupted:
+                                if response_active[0] and not speech_started_sent[0]:
+                                    await safe_send({"type": "input_audio_buffer.speech_started"})
+                                    speech_started_sent[0] = True
+                                interrupt_response("upstream")
+                                end_interruption()
 
                             # Handle tool calls (not used but log for debugging)
                             if response.tool_call:
-                                print(f"Tool call received: {response.tool_call}", flush=True)
+                                logger.debug("Tool call received: %s", response.tool_call)
 
                             # Flush remaining audio buffer on turn complete
                             if response.server_content and response.server_content.turn_complete:
+                                end_interruption()
                                 turn_count[0] += 1
-                                print(f"Turn {turn_count[0]} complete - ready for next input", flush=True)
+                                logger.info("Turn %d complete - ready for next input", turn_count[0])
+                                log_context.turn = turn_count[0]
 
-                                if audio_buffer_local:
-                                    combined_audio = ''.join(audio_buffer_local)
-                                    buffered_msg = {
-                                        "type": "response.audio.delta",
-                                        "delta": combined_audio
-                                    }
-                                    await safe_send(buffered_msg)
-                                    print(f"Flushed final audio buffer: {buffer_sample_count_local} samples", flush=True)
+                                if output_buffer:
+                                    samples = output_buffer.samples
+                                    await flush_output_audio("turn_complete")
+                                    log_sampled(logger, logging.DEBUG, "flush", "Flushed final audio buffer: %d samples", samples)
 
-                                    # Reset buffer
-                                    audio_buffer_local.clear()
-                                    buffer_sample_count_local = 0
+                                # Closed after the final flush so its audio counts towards this turn
+                                turn_record = session_metrics.turn_complete()
+                                logger.debug("Turn metrics: %s", turn_record)
 
                                 # Send AI transcript if we have one
                                 if ai_transcript_parts:
                                     full_transcript = ''.join(ai_transcript_parts)
-                                    print(f"AI full transcript: {full_transcript}", flush=True)
+                                    logger.debug("AI full transcript: %s", full_transcript)
                                     transcript_msg = {
                                         "type": "response.audio_transcript.done",
                                         "transcript": full_transcript
                                     }
                                     await safe_send(transcript_msg)
-                                    ai_transcript_parts.clear()
+
+                                # Keep the turn for /history; written to disk in the background
+                                transcript_store.record(session_id, {
+                                    "turn": turn_count[0],
+                                    "completed_at": time.time(),
+                                    "user_transcript": ''.join(user_transcript_parts),
+                                    "ai_transcript": ''.join(ai_transcript_parts),
+                                    "sentiment": turn_sentiment[0],
+                                    **turn_record
+                                })
 
                                 # Reset user transcript state for next turn
                                 user_transcript_parts.clear()
+                                ai_transcript_parts.clear()
+                                turn_sentiment[0] = None
+                                sentiment_tracker.reset()
+                                sentiment_seconds[0] = 0.0
+                                provisional_sentiment[0] = "NEUTRAL"
                                 user_transcript_sent[0] = False
                                 speech_started_sent[0] = False
 
@@ -380,40 +802,81 @@ async def websocket_realtime(websocket: WebSocket):
                                 }
                                 await safe_send(done_msg)
 
-                        # If we get here, the receive iterator ended - log and continue the while loop
-                        print("Receive iterator ended, waiting before restart...", flush=True)
-                        await asyncio.sleep(0.1)  # Small delay before restarting
+                        logger.debug("Receive iterator ended, listening for the next turn")
 
+                except UpstreamLost as e:
+                    logger.error("Upstream lost, closing the session: %s", e)
+                    await close_client("upstream_lost", "Lost the connection to Gemini, please reconnect")
                 except Exception as e:
-                    print(f"Error forwarding to client: {e}", flush=True)
-                    import traceback
-                    traceback.print_exc()
+                    logger.exception("Error forwarding to client: %s", e)
+                    await close_client("internal_error", "Internal error, please reconnect")
                 finally:
-                    print("forward_to_client task ended!", flush=True)
-
-            # Run both tasks concurrently
-            print("Starting forward tasks...", flush=True)
+                    if deadline_flush_task[0] is not None:
+                        deadline_flush_task[0].cancel()
+                    logger.debug("forward_to_client task ended!")
+
+            async def close_client(reason, message, code=CLOSE_INTERNAL_ERROR):
+                """Tell the client why the session ends and close its socket"""
+                await safe_send({"type": "error", "error": {"code": reason, "message": message}})
+                ws_open[0] = False
+                try:
+                    await websocket.close(code=code)
+                except Exception:
+                    pass
+
+            async def watch_session():
+                """Close the session once it is idle, or quiet while the server drains"""
+                while True:
+                    await asyncio.sleep(1.0)
+                    now = time.monotonic()
+                    quiet = now - last_activity[0]
+                    idle = now - max(last_activity[0], last_mic_audio[0] if vad.mode == "off" else 0.0)
+                    if gate.draining and not response_active[0] and quiet >= DRAIN_QUIET_SECONDS:
+                        reason, code, message = DRAINING.reason, DRAINING.close_code, DRAINING.message
+                    elif SESSION_IDLE_TIMEOUT and idle >= SESSION_IDLE_TIMEOUT:
+                        reason, code, message = "idle", CLOSE_NORMAL, f"Session closed after {idle:.0f}s of inactivity"
+                    else:
+                        continue
+
+                    logger.info("Closing session: %s", reason)
+                    SESSIONS_REAPED.labels(reason=reason).inc()
+                    await close_client(reason, message, code)
+                    return
+
+            # The session lasts as long as both directions do: once the reader sees
+            # the client go (or the watchdog closes it), or the upstream is lost for
+            # good, everything else stops
+            logger.debug("Starting forward tasks...")
+            reader = asyncio.create_task(forward_to_gemini())
+            writer = asyncio.create_task(forward_to_client())
+            tasks = [
+                reader,
+                writer,
+                asyncio.create_task(send_to_gemini()),
+                asyncio.create_task(watch_session()),
+            ]
             try:
-                await asyncio.gather(
-                    forward_to_gemini(),
-                    forward_to_client(),
-                    return_exceptions=True
-                )
-            except Exception as e:
-                print(f"Error in gather: {e}", flush=True)
-                import traceback
-                traceback.print_exc()
+                await asyncio.wait([reader, writer], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                active_upstream_queues.discard(upstream_queue)
 
     except Exception as e:
-        import traceback
-        print(f"WebSocket error: {e}")
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("WebSocket error: %s", e)
         try:
             await websocket.close()
         except:
             pass
+    finally:
+        gate.release()
+        SESSIONS_ACTIVE.dec()
+        transcript_store.end_session(session_id)
+        logger.info("Session summary: %s", session_metrics.summary())
 
 
 if __name__ == "__main__":
+    # Single-process development server; use serve.py for production
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=2179)
@@ -0,0 +1,562 @@
+"""In-process metrics exposed in the Prometheus text format on /metrics.
+
+Metrics are plain Python objects updated on the event loop: incrementing a
+counter is a dict lookup and an add, so they are cheap enough for per-chunk
+use. Call .labels(...) once up front and keep the child for hot paths.
+
+When several worker processes serve the app (see serve.py), each one sees
+only its own metrics. With `Registry.multiprocess_dir` set, every worker
+periodically writes a snapshot of its registry there, and /metrics on any
+worker merges them: counters and histograms are summed over all workers,
+including ones that have exited, so they never appear to reset; gauges are
+reported per live worker with a `worker` label.
+"""
+import bisect
+import glob
+import json
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """Child metric for one combination of label values"""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _unlabelled(self):
+        return self._children[()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"]
+
+    def snapshot(self) -> dict:
+        """JSON-serializable state, for merging across worker processes"""
+        return {
+            "type": self.type_name,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "children": [[list(key), self._child_state(child)] for key, child in self._children.items()],
+        }
+
+    def _child_state(self, child):
+        return child.value
+
+    def _merge_child(self, key, state) -> None:
+        self.labels(**dict(zip(self.labelnames, key))).inc(state)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._unlabelled().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+
+# Latency buckets in seconds, from sub-millisecond work to multi-second waits
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * len(upper_bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self):
+        """Context manager observing the duration of its block"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("_target", "_started")
+
+    def __init__(self, target):
+        self._target = target
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._target.observe(time.perf_counter() - self._started)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(buckets)) + (float("inf"),)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def snapshot(self) -> dict:
+        state = super().snapshot()
+        state["buckets"] = list(self.upper_bounds[:-1])
+        return state
+
+    def _child_state(self, child):
+        return {"counts": list(child.counts), "sum": child.sum, "count": child.count}
+
+    def _merge_child(self, key, state) -> None:
+        child = self.labels(**dict(zip(self.labelnames, key)))
+        for i, count in enumerate(state["counts"]):
+            child.counts[i] += count
+        child.sum += state["sum"]
+        child.count += state["count"]
+
+    def _render_child(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(child.upper_bounds, child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+        # Directory shared by the worker processes for metrics snapshots; None when
+        # this process serves alone
+        self.multiprocess_dir: Optional[str] = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]) -> None:
+        """Register a callback producing metrics at scrape time"""
+        self._collectors.append(collector)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Optional[Iterable[float]] = None) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+    def _collect(self) -> Iterable[_Metric]:
+        yield from self._metrics.values()
+        for collector in self._collectors:
+            yield from collector()
+
+    def snapshot(self) -> dict:
+        """State of every metric, keyed by name"""
+        return {metric.name: metric.snapshot() for metric in self._collect()}
+
+    def write_snapshot(self, snapshot: dict) -> None:
+        """Publish this worker's snapshot for the others (blocking file I/O)"""
+        path = os.path.join(self.multiprocess_dir, f"{SNAPSHOT_PREFIX}{os.getpid()}{SNAPSHOT_SUFFIX}")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+
+    def read_snapshots(self) -> List[Tuple[int, dict]]:
+        """Snapshots of the other workers as (pid, snapshot) pairs (blocking file I/O)"""
+        if not self.multiprocess_dir:
+            return []
+        snapshots = []
+        pattern = os.path.join(self.multiprocess_dir, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}")
+        for path in glob.glob(pattern):
+            pid = int(os.path.basename(path)[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)])
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshots.append((pid, json.load(f)))
+            except (OSError, ValueError):
+                continue  # replaced or removed while it was read
+        return snapshots
+
+    def render(self, snapshots: Sequence[Tuple[int, dict]] = ()) -> str:
+        """Text exposition of this process's metrics, merged with other workers' snapshots"""
+        if self.multiprocess_dir:
+            metrics = _merge([(os.getpid(), self.snapshot()), *snapshots]).values()
+        else:
+            metrics = self._collect()
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+SNAPSHOT_PREFIX = "metrics-"
+SNAPSHOT_SUFFIX = ".json"
+_METRIC_TYPES = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+
+def _merge(snapshots: Iterable[Tuple[int, dict]]) -> Dict[str, _Metric]:
+    """Sum counters and histograms over workers; label gauges of live workers by pid"""
+    merged: Dict[str, _Metric] = {}
+    for pid, snapshot in snapshots:
+        alive = pid_alive(pid)
+        for name, state in snapshot.items():
+            per_worker = state["type"] == "gauge"
+            if per_worker and not alive:
+                continue
+            metric = merged.get(name)
+            if metric is None:
+                labelnames = (["worker"] if per_worker else []) + state["labelnames"]
+                kwargs = {"buckets": state["buckets"]} if state["type"] == "histogram" else {}
+                metric = merged[name] = _METRIC_TYPES[state["type"]](name, state["help"], labelnames, **kwargs)
+            for key, value in state["children"]:
+                metric._merge_child([pid, *key] if per_worker else key, value)
+    return merged
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this pid exists (used to spot exited workers)"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def clear_snapshots(directory: str) -> None:
+    """Remove snapshots left behind by a previous run of the server"""
+    for path in glob.glob(os.path.join(directory, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}*")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+REGISTRY = Registry()
+
+# Sessions
+SESSIONS_ACTIVE = REGISTRY.gauge("ellen_sessions_active", "Realtime sessions currently open")
+SESSIONS_TOTAL = REGISTRY.counter("ellen_sessions_total", "Realtime sessions accepted")
+TURNS_TOTAL = REGISTRY.counter("ellen_turns_total", "Model turns completed")
+SESSIONS_REJECTED = REGISTRY.counter("ellen_sessions_rejected_total", "Realtime sessions turned away", ["reason"])
+SESSIONS_REAPED = REGISTRY.counter("ellen_sessions_reaped_total", "Realtime sessions closed by the server", ["reason"])
+
+# Latency
+TIME_TO_FIRST_UPSTREAM_AUDIO = REGISTRY.histogram(
+    "ellen_time_to_first_upstream_audio_seconds",
+    "Time from WebSocket accept until the first client audio reached Gemini"
+)
+RESPONSE_LATENCY = REGISTRY.histogram(
+    "ellen_response_latency_seconds",
+    "Time from the end of user speech to the first AI audio chunk of the turn"
+)
+SENTIMENT_SECONDS = REGISTRY.histogram(
+    "ellen_sentiment_seconds",
+    "Time spent analysing the sentiment of a user transcript",
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+)
+
+# Throughput
+AUDIO_BYTES = REGISTRY.counter("ellen_audio_bytes_total", "PCM16 audio bytes forwarded", ["direction"])
+AUDIO_BYTES_IN = AUDIO_BYTES.labels(direction="in")
+AUDIO_BYTES_OUT = AUDIO_BYTES.labels(direction="out")
+OUTPUT_FLUSHES = REGISTRY.counter("ellen_output_flushes_total", "Output audio buffer flushes", ["reason"])
+SEND_FAILURES = REGISTRY.counter("ellen_send_failures_total", "Failed sends", ["target"])
+CLIENT_SEND_FAILURES = SEND_FAILURES.labels(target="client")
+UPSTREAM_SEND_FAILURES = SEND_FAILURES.labels(target="upstream")
+CODEC_SAVED_BYTES = REGISTRY.counter(
+    "ellen_codec_saved_bytes_total",
+    "Client link bytes saved by compact audio encodings, compared to PCM16",
+    ["direction"]
+)
+CODEC_SAVED_BYTES_IN = CODEC_SAVED_BYTES.labels(direction="in")
+CODEC_SAVED_BYTES_OUT = CODEC_SAVED_BYTES.labels(direction="out")
+
+# Upstream audio queue
+UPSTREAM_FRAMES = REGISTRY.counter("ellen_upstream_frames_total", "Coalesced audio frames sent to Gemini")
+UPSTREAM_DROPPED_BYTES = REGISTRY.counter(
+    "ellen_upstream_dropped_bytes_total",
+    "Mic audio bytes dropped because the upstream queue was full"
+)
+UPSTREAM_RECONNECTS = REGISTRY.counter(
+    "ellen_upstream_reconnects_total",
+    "Gemini Live sessions reconnected (and resumed) mid-conversation",
+    ["reason"]
+)
+UPSTREAM_RESUME_SECONDS = REGISTRY.histogram(
+    "ellen_upstream_resume_seconds",
+    "Time to reconnect a dropped Gemini Live session and replay unconsumed input"
+)
+UPSTREAM_REPLAYED_BYTES = REGISTRY.counter(
+    "ellen_upstream_replayed_bytes_total",
+    "Mic audio bytes resent to Gemini after a reconnect"
+)
+
+# Server-side voice activity detection
+VAD_BYTES = REGISTRY.counter("ellen_vad_bytes_total", "Mic audio bytes seen by the VAD", ["decision"])
+VAD_FORWARDED_BYTES = VAD_BYTES.labels(decision="forwarded")
+VAD_SUPPRESSED_BYTES = VAD_BYTES.labels(decision="suppressed")
+VAD_STREAM_ENDS = REGISTRY.counter("ellen_vad_stream_ends_total", "Audio streams ended by the VAD after speech")
+
+# Barge-in
+INTERRUPTIONS = REGISTRY.counter("ellen_interruptions_total", "AI responses interrupted", ["source"])
+INTERRUPTION_SAVED_BYTES = REGISTRY.histogram(
+    "ellen_interruption_saved_bytes",
+    "Output audio bytes not sent to the client because the response was interrupted",
+    buckets=(4800, 12000, 24000, 48000, 96000, 240000, 480000, 960000)  # 0.1s .. 20s at 24kHz
+)
+
+
+class SessionMetrics:
+    """Per-session and per-turn measurements, feeding the global histograms"""
+
+    # Per-turn records kept for the session summary
+    MAX_TURNS = 100
+
+    def __init__(self):
+        self.accepted_at = time.monotonic()
+        self.first_upstream_audio_at = None
+        self.audio_bytes_in = 0
+        self.audio_bytes_out = 0
+        self.flushes = 0
+        self.send_failures = 0
+        self.upstream_dropped_bytes = 0
+        self.upstream_queue_max_bytes = 0
+        self.vad_forwarded_bytes = 0
+        self.vad_suppressed_bytes = 0
+        self.interruptions = 0
+        self.interruption_saved_bytes = 0
+        self.codec_saved_bytes = 0
+        self.upstream_reconnects = 0
+        self.turns = []
+        self.turn_count = 0  # every turn, not just the last MAX_TURNS records
+        self._new_turn()
+
+    def _new_turn(self) -> None:
+        self.turn = {
+            "audio_bytes_in": 0,
+            "audio_bytes_out": 0,
+            "flushes": 0,
+            "speech_end_at": None,
+            "response_latency": None,
+            "sentiment_seconds": None,
+            "interrupted_by": None,
+            "interruption_saved_bytes": 0,
+        }
+
+    def upstream_audio(self, size: int, queue_depth: int = 0) -> None:
+        """Record a frame sent to Gemini and the queue depth left behind it"""
+        if self.first_upstream_audio_at is None:
+            self.first_upstream_audio_at = time.monotonic()
+            TIME_TO_FIRST_UPSTREAM_AUDIO.observe(self.first_upstream_audio_at - self.accepted_at)
+        self.audio_bytes_in += size
+        self.turn["audio_bytes_in"] += size
+        AUDIO_BYTES_IN.inc(size)
+        UPSTREAM_FRAMES.inc()
+        if queue_depth > self.upstream_queue_max_bytes:
+            self.upstream_queue_max_bytes = queue_depth
+
+    def upstream_dropped(self, size: int) -> None:
+        self.upstream_dropped_bytes += size
+        UPSTREAM_DROPPED_BYTES.inc(size)
+
+    def vad(self, forwarded_bytes: int, suppressed_bytes: int) -> None:
+        """Record the VAD's running totals for this session"""
+        VAD_FORWARDED_BYTES.inc(forwarded_bytes - self.vad_forwarded_bytes)
+        VAD_SUPPRESSED_BYTES.inc(suppressed_bytes - self.vad_suppressed_bytes)
+        self.vad_forwarded_bytes = forwarded_bytes
+        self.vad_suppressed_bytes = suppressed_bytes
+
+    def vad_stream_ended(self) -> None:
+        VAD_STREAM_ENDS.inc()
+
+    def upstream_reconnected(self, reason: str, seconds: float, replayed_bytes: int) -> None:
+        self.upstream_reconnects += 1
+        UPSTREAM_RECONNECTS.labels(reason=reason).inc()
+        UPSTREAM_RESUME_SECONDS.observe(seconds)
+        UPSTREAM_REPLAYED_BYTES.inc(replayed_bytes)
+
+    def speech_ended(self) -> None:
+        """Mark the latest sign that the user is done speaking this turn"""
+        self.turn["speech_end_at"] = time.monotonic()
+
+    def first_model_audio(self) -> None:
+        speech_end_at = self.turn["speech_end_at"]
+        if speech_end_at is not None and self.turn["response_latency"] is None:
+            latency = time.monotonic() - speech_end_at
+            self.turn["response_latency"] = latency
+            RESPONSE_LATENCY.observe(latency)
+
+    def sentiment(self, seconds: float) -> None:
+        self.turn["sentiment_seconds"] = seconds
+        SENTIMENT_SECONDS.observe(seconds)
+
+    def flushed(self, reason: str, size: int) -> None:
+        self.flushes += 1
+        self.turn["flushes"] += 1
+        self.audio_bytes_out += size
+        self.turn["audio_bytes_out"] += size
+        OUTPUT_FLUSHES.labels(reason=reason).inc()
+        AUDIO_BYTES_OUT.inc(size)
+
+    def transcoded(self, direction: str, pcm_size: int, wire_size: int) -> None:
+        """Record client audio that travelled in a compact encoding"""
+        saved = pcm_size - wire_size
+        self.codec_saved_bytes += saved
+        (CODEC_SAVED_BYTES_IN if direction == "in" else CODEC_SAVED_BYTES_OUT).inc(saved)
+
+    def send_failed(self, target: str) -> None:
+        self.send_failures += 1
+        (CLIENT_SEND_FAILURES if target == "client" else UPSTREAM_SEND_FAILURES).inc()
+
+    def interrupted(self, source: str) -> None:
+        self.interruptions += 1
+        self.turn["interrupted_by"] = source
+        INTERRUPTIONS.labels(source=source).inc()
+
+    def interruption_ended(self, saved_bytes: int) -> None:
+        """Record the output audio an interruption kept from being sent"""
+        self.interruption_saved_bytes += saved_bytes
+        self.turn["interruption_saved_bytes"] += saved_bytes
+        INTERRUPTION_SAVED_BYTES.observe(saved_bytes)
+
+    def turn_complete(self) -> dict:
+        """Close the current turn and return its record"""
+        record = dict(self.turn)
+        del record["speech_end_at"]
+        self.turns.append(record)
+        self.turn_count += 1
+        if len(self.turns) > self.MAX_TURNS:
+            del self.turns[0]
+        TURNS_TOTAL.inc()
+        self._new_turn()
+        return record
+
+    def summary(self) -> dict:
+        """Totals for the whole session"""
+        time_to_first_audio = None
+        if self.first_upstream_audio_at is not None:
+            time_to_first_audio = self.first_upstream_audio_at - self.accepted_at
+        latencies = [t["response_latency"] for t in self.turns if t["response_latency"] is not None]
+        vad_total_bytes = self.vad_forwarded_bytes + self.vad_suppressed_bytes
+        return {
+            "duration_seconds": time.monotonic() - self.accepted_at,
+            "turns": self.turn_count,
+            "time_to_first_upstream_audio_seconds": time_to_first_audio,
+            "mean_response_latency_seconds": sum(latencies) / len(latencies) if latencies else None,
+            "audio_bytes_in": self.audio_bytes_in,
+            "audio_bytes_out": self.audio_bytes_out,
+            "flushes": self.flushes,
+            "send_failures": self.send_failures,
+            "upstream_dropped_bytes": self.upstream_dropped_bytes,
+            "upstream_queue_max_bytes": self.upstream_queue_max_bytes,
+            "upstream_reconnects": self.upstream_reconnects,
+            "codec_saved_bytes": self.codec_saved_bytes,
+            "interruptions": self.interruptions,
+            "interruption_saved_bytes": self.interruption_saved_bytes,
+            "vad_suppressed_fraction": (
+                self.vad_suppressed_bytes / vad_total_bytes if vad_total_bytes else 0.0
+            ),
+        }
@@ -0,0 +1,107 @@
+"""Personas a realtime conversation can be held with, prebuilt once per process.
+
+A persona is a voice, a Live model and a system prompt. Its LiveConnectConfig
+is built when the registry is created, not per connection; connecting only
+takes a shallow copy of it (adding the resumption handle when resuming), so
+the shared config is never modified by the SDK. Clients pick a persona with
+the `persona` query parameter of /ws/realtime:
+
+    ws://localhost:2179/ws/realtime?persona=ellen-kore
+
+Without one they get the registry's default.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+from google.genai import types
+
+DEFAULT_MODEL = "models/gemini-2.0-flash-exp"
+
+ELLEN_PROMPT = """You are 'Ellen', a warm, wise, and empathetic British friend designed to provide caring support and companionship.
+
+CRITICAL: Listen carefully to what the user ACTUALLY says. Do not make up topics or context that wasn't mentioned. Respond ONLY to what they tell you.
+
+Your tone should be comforting, non-judgmental, validating, and casually conversational with a gentle British manner.
+Use British English spellings (favour, colour, realise, etc.) but avoid overly familiar terms of endearment like 'love', 'dear', or 'pet'.
+Avoid overly clinical language unless asked. Focus on emotional support and practical, gentle advice.
+
+When someone says they're not feeling well, not feeling great, or not feeling their best - recognize this as NEGATIVE sentiment and respond with empathy and support.
+
+IMPORTANT: The user speaks English. Always interpret their speech as English."""
+
+
+@dataclass(frozen=True)
+class PersonaSpec:
+    """What a persona is made of; see BUILTIN_PERSONAS"""
+    name: str
+    voice: str
+    system_prompt: str = ELLEN_PROMPT
+    model: Optional[str] = None  # the registry's model when None
+
+
+# The first one is the default
+BUILTIN_PERSONAS = (
+    PersonaSpec("ellen", voice="Aoede"),
+    PersonaSpec("ellen-kore", voice="Kore"),
+    PersonaSpec("ellen-charon", voice="Charon"),
+)
+
+
+@dataclass(frozen=True)
+class Persona:
+    """A persona with its Live session config built ahead of time"""
+    name: str
+    voice: str
+    model: str
+    config: types.LiveConnectConfig = field(repr=False, compare=False)
+
+    def connect_config(self, handle: Optional[str] = None) -> types.LiveConnectConfig:
+        """Config for a new Live session, resuming `handle` if given"""
+        if handle is None:
+            return self.config.model_copy()
+        resumption = self.config.session_resumption.model_copy(update={"handle": handle})
+        return self.config.model_copy(update={"session_resumption": resumption})
+
+
+def build_persona(spec: PersonaSpec, model: str = DEFAULT_MODEL, transparent_resumption: bool = False) -> Persona:
+    """Build the Live session config for a persona"""
+    config = types.LiveConnectConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=spec.voice)
+            )
+        ),
+        output_audio_transcription=types.AudioTranscriptionConfig(),
+        input_audio_transcription=types.AudioTranscriptionConfig(),
+        # Every Live session asks for resumption handles (see live_link.py)
+        session_resumption=types.SessionResumptionConfig(
+            transparent=True if transparent_resumption else None
+        ),
+        # As a Content already, so the SDK has nothing to convert on connect
+        system_instruction=types.Content(role="user", parts=[types.Part(text=spec.system_prompt)])
+    )
+    return Persona(spec.name, spec.voice, spec.model or model, config)
+
+
+class PersonaRegistry:
+    """Prebuilt personas by name"""
+
+    def __init__(self, specs: Iterable[PersonaSpec] = BUILTIN_PERSONAS, model: str = DEFAULT_MODEL,
+                 transparent_resumption: bool = False):
+        self._personas: Dict[str, Persona] = {}
+        for spec in specs:
+            self._personas[spec.name] = build_persona(spec, model, transparent_resumption)
+        if not self._personas:
+            raise ValueError("A persona registry needs at least one persona")
+        self.default = next(iter(self._personas.values()))
+
+    @property
+    def names(self):
+        return list(self._personas)
+
+    def get(self, name: Optional[str] = None) -> Optional[Persona]:
+        """The named persona (the default when no name is given), or None if unknown"""
+        if not name:
+            return self.default
+        return self._personas.get(name)
@@ -0,0 +1,132 @@
+"""Wire protocol helpers for the /ws/realtime WebSocket.
+
+Control events are always JSON text frames. Audio can additionally travel as
+binary frames once the client opts in with a ``session.update`` event:
+
+    {"type": "session.update", "session": {"audio_transport": "binary"}}
+
+Each binary frame is a fixed 6-byte header followed by raw PCM16 audio.
+Clients that never send the update keep the base64-in-JSON text protocol.
+
+The same event configures output buffering, server-side voice activity
+detection (see vad.py), e.g. {"vad_mode": "drop", "vad_hangover_ms": 500},
+and compact audio encodings for either direction (see codec.py), e.g.
+{"input_audio_format": "g711_ulaw", "output_audio_format": "ima_adpcm"}.
+Audio payloads, binary or base64, are in the negotiated format.
+"""
+import struct
+from dataclasses import dataclass, asdict
+
+from codec import AUDIO_FORMATS, FORMAT_PCM16
+from vad import VAD_MODES
+
+# Binary frame header: protocol version, message kind, sequence number
+FRAME_HEADER = struct.Struct("!BBI")
+PROTOCOL_VERSION = 1
+
+# Binary message kinds
+KIND_INPUT_AUDIO = 1  # client -> server, equivalent to input_audio_buffer.append
+KIND_OUTPUT_AUDIO = 2  # server -> client, equivalent to response.audio.delta
+
+# Audio transports
+TRANSPORT_TEXT = "text"
+TRANSPORT_BINARY = "binary"
+AUDIO_TRANSPORTS = (TRANSPORT_TEXT, TRANSPORT_BINARY)
+
+
+class ProtocolError(ValueError):
+    """Raised when a client sends a frame or session update we cannot accept"""
+
+
+def pack_frame(kind: int, seq: int, payload: bytes) -> bytes:
+    """Prefix an audio payload with the binary frame header"""
+    return FRAME_HEADER.pack(PROTOCOL_VERSION, kind, seq & 0xFFFFFFFF) + payload
+
+
+def unpack_frame(frame: bytes):
+    """Split a binary frame into (kind, seq, payload)"""
+    if len(frame) < FRAME_HEADER.size:
+        raise ProtocolError(f"Binary frame too short: {len(frame)} bytes")
+    version, kind, seq = FRAME_HEADER.unpack_from(frame)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported binary frame version: {version}")
+    return kind, seq, memoryview(frame)[FRAME_HEADER.size:]
+
+
+# Limits for the output audio buffer settings a client may request
+OUTPUT_FRAME_SAMPLES_RANGE = (240, 48000)  # 10ms .. 2s at 24kHz
+OUTPUT_TARGET_LATENCY_MS_RANGE = (10, 2000)
+
+# Limits for the voice activity detection settings
+VAD_THRESHOLD_DB_RANGE = (-90, 0)
+VAD_HANGOVER_MS_RANGE = (0, 5000)
+VAD_PREROLL_MS_RANGE = (0, 2000)
+
+
+def _int_in_range(session: dict, key: str, bounds):
+    value = session[key]
+    low, high = bounds
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ProtocolError(f"{key} must be an integer between {low} and {high}")
+    return value
+
+
+@dataclass
+class SessionOptions:
+    """Per-connection settings negotiated through session.update"""
+    audio_transport: str = TRANSPORT_TEXT
+    # Encoding of the audio exchanged with the client (Gemini always gets PCM16)
+    input_audio_format: str = FORMAT_PCM16
+    output_audio_format: str = FORMAT_PCM16
+    # Output audio is flushed once this many samples are buffered...
+    output_frame_samples: int = 6000  # ~250ms at 24kHz sample rate
+    # ...or once the oldest buffered sample has waited this long
+    output_target_latency_ms: int = 250
+    # Server-side VAD for mic audio: "off", "drop" or "thin" (see vad.py)
+    vad_mode: str = "off"
+    # Level (dBFS) a 10ms window must exceed to count as speech
+    vad_threshold_db: int = -45
+    # Audio kept flowing after speech stops, and sent ahead of it when it starts
+    vad_hangover_ms: int = 400
+    vad_preroll_ms: int = 200
+
+    def apply_update(self, session: dict) -> None:
+        """Validate and apply the "session" object of a session.update event"""
+        if not isinstance(session, dict):
+            raise ProtocolError("session.update requires a 'session' object")
+
+        # Validate everything before applying so a bad update changes nothing
+        updates = {}
+        transport = session.get("audio_transport")
+        if transport is not None:
+            if transport not in AUDIO_TRANSPORTS:
+                raise ProtocolError(f"Unsupported audio_transport: {transport!r}")
+            updates["audio_transport"] = transport
+        for key in ("input_audio_format", "output_audio_format"):
+            audio_format = session.get(key)
+            if audio_format is not None:
+                if audio_format not in AUDIO_FORMATS:
+                    raise ProtocolError(f"Unsupported {key}: {audio_format!r}")
+                updates[key] = audio_format
+        if "output_frame_samples" in session:
+            updates["output_frame_samples"] = _int_in_range(session, "output_frame_samples", OUTPUT_FRAME_SAMPLES_RANGE)
+        if "output_target_latency_ms" in session:
+            updates["output_target_latency_ms"] = _int_in_range(session, "output_target_latency_ms", OUTPUT_TARGET_LATENCY_MS_RANGE)
+        vad_mode = session.get("vad_mode")
+        if vad_mode is not None:
+            if vad_mode not in VAD_MODES:
+                raise ProtocolError(f"Unsupported vad_mode: {vad_mode!r}")
+            updates["vad_mode"] = vad_mode
+        if "vad_threshold_db" in session:
+            updates["vad_threshold_db"] = _int_in_range(session, "vad_threshold_db", VAD_THRESHOLD_DB_RANGE)
+        if "vad_hangover_ms" in session:
+            updates["vad_hangover_ms"] = _int_in_range(session, "vad_hangover_ms", VAD_HANGOVER_MS_RANGE)
+        if "vad_preroll_ms" in session:
+            updates["vad_preroll_ms"] = _int_in_range(session, "vad_preroll_ms", VAD_PREROLL_MS_RANGE)
+
+        for key, value in updates.items():
+            setattr(self, key, value)
+
+    def describe(self) -> dict:
+        """Session object echoed back to the client"""
+        return asdict(self)
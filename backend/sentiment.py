@@ -0,0 +1,258 @@
+"""Keyword and phrase based sentiment analysis for user transcripts.
+
+All word lists are compiled once at import into a single trie-shaped regex, so
+a transcript is scanned in one pass instead of one substring search per phrase.
+StreamingSentiment applies the same rules to a transcript that arrives in
+fragments, scanning each character about once.
+"""
+import re
+from bisect import bisect_right
+from typing import Iterable, List
+
+# Positive keywords
+POSITIVE_WORDS = (
+    'happy', 'great', 'good', 'better', 'wonderful', 'excited', 'glad',
+    'relieved', 'thankful', 'grateful', 'love', 'excellent', 'amazing',
+    'fantastic', 'joy', 'pleased', 'delighted', 'blessed', 'fortunate',
+    'perfect', 'brilliant', 'awesome', 'super', 'proud', 'hopeful'
+)
+
+# Negative keywords - expanded significantly
+NEGATIVE_WORDS = (
+    'sad', 'bad', 'worse', 'awful', 'terrible', 'angry', 'frustrated',
+    'anxious', 'worried', 'pain', 'hurt', 'difficult', 'hard', 'struggling',
+    'depressed', 'upset', 'problem', 'issue', 'trouble', 'concern', 'stress',
+    'overwhelm', 'exhaust', 'tire', 'sick', 'ill', 'uncomfortable', 'scary',
+    'fear', 'afraid', 'nervous', 'tense', 'irritable', 'annoyed', 'miserable',
+    'hopeless', 'helpless', 'lonely', 'isolated', 'crying', 'tears', 'suffer',
+    'ache', 'sore', 'insomnia', 'sleepless', 'fatigue', 'weary', 'drained',
+    'nausea', 'dizzy', 'headache', 'migraine', 'cramp', 'sweat', 'hot flash',
+    'mood swing', 'irritat', 'anger', 'rage', 'panic', 'attack', 'unable',
+    'can\'t', 'cannot', 'won\'t', 'fail', 'loss', 'lost', 'gone', 'missing'
+)
+
+# Negation words
+NEGATIONS = ('not', 'no', 'never', 'don\'t', 'dont', 'doesn\'t', 'doesnt', 'didn\'t', 'didnt', 'isn\'t', 'isnt', 'aren\'t', 'arent')
+
+# Strong negative phrases (highest priority to catch negations)
+STRONG_NEGATIVE_PHRASES = (
+    'don\'t feel good', 'dont feel good', 'not feeling good', 'not feeling well',
+    'don\'t feel well', 'dont feel well', 'not feel good', 'not feel well',
+    'not feeling great', 'not feeling my best', 'not feeling the best',
+    'not feeling best', 'not my best',
+    'feel bad', 'feel awful', 'feel terrible', 'feeling bad', 'feeling awful',
+    'bad day', 'terrible day', 'awful day', 'not good', 'not great', 'not well',
+    'having trouble', 'having problems', 'having issues', 'can\'t sleep',
+    'unable to sleep', 'sleep problem', 'sleep issue', 'waking up', 'night sweat',
+    'weight gain', 'weight loss', 'no energy', 'not happy',
+    # Physical pain phrases
+    'sore back', 'back pain', 'back hurts', 'my back', 'bad back', 'hurt my back',
+    'sore neck', 'neck pain', 'headache', 'migraine', 'in pain', 'feeling pain',
+    'hurts', 'aching', 'stiff', 'pulled a muscle', 'muscle pain',
+    # Illness phrases
+    'have a cold', 'got a cold', 'caught a cold', 'feeling sick', 'feel sick',
+    'under the weather', 'not well', 'unwell', 'flu', 'fever', 'cough',
+    'runny nose', 'blocked nose', 'stuffy', 'sneezing', 'sore throat'
+)
+
+# Strong positive phrases (only count when no strong negative phrase matched)
+STRONG_POSITIVE_PHRASES = (
+    'feel better', 'feeling better', 'feel great', 'feeling great',
+    'feel wonderful', 'feeling wonderful', 'feel amazing', 'feeling amazing',
+    'so happy', 'very happy', 'really happy', 'feeling good'
+)
+
+# Negations directly before a positive word (e.g. "not happy", "don't feel good")
+NEGATED_POSITIVE_PHRASES = tuple(
+    phrase
+    for negation in NEGATIONS
+    for positive_word in POSITIVE_WORDS
+    for phrase in (f"{negation} {positive_word}", f"{negation} feel {positive_word}")
+)
+
+# Messages that are always NEUTRAL when no strong phrase matched
+GREETINGS = frozenset(['hi', 'hello', 'hey', 'yes', 'no', 'ok', 'okay'])
+
+# Match flags, in priority order
+_STRONG_NEGATIVE = 1
+_STRONG_POSITIVE = 2
+_NEGATED_POSITIVE = 4
+
+
+def _build_pattern_index():
+    """Map every pattern to its flags and word ids, then expand to prefixes"""
+    flags = {}
+    word_ids = {}
+    for phrase in STRONG_NEGATIVE_PHRASES:
+        flags[phrase] = flags.get(phrase, 0) | _STRONG_NEGATIVE
+    for phrase in STRONG_POSITIVE_PHRASES:
+        flags[phrase] = flags.get(phrase, 0) | _STRONG_POSITIVE
+    for phrase in NEGATED_POSITIVE_PHRASES:
+        flags[phrase] = flags.get(phrase, 0) | _NEGATED_POSITIVE
+    # Word ids: positive words are 0..n-1, negative words are n..n+m-1
+    for i, word in enumerate(POSITIVE_WORDS + NEGATIVE_WORDS):
+        flags.setdefault(word, 0)
+        word_ids.setdefault(word, set()).add(i)
+
+    # The regex reports only the longest pattern starting at each position.
+    # Every shorter pattern matching at that position is a prefix of it, so
+    # fold the prefixes' flags and word ids into the longest one up front.
+    index = {}
+    for pattern in flags:
+        pattern_flags = 0
+        pattern_words = set()
+        for other, other_flags in flags.items():
+            if pattern.startswith(other):
+                pattern_flags |= other_flags
+                pattern_words |= word_ids.get(other, set())
+        index[pattern] = (pattern_flags, frozenset(pattern_words))
+    return index
+
+
+def _trie_regex(patterns) -> str:
+    """Build a regex for a set of literals that prefers the longest match"""
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        # Greedy optional group: try the longer continuation before stopping here
+        return group + '?' if terminal else group
+
+    return emit(trie)
+
+
+_PATTERN_INDEX = _build_pattern_index()
+_MATCHER = re.compile('(?=(' + _trie_regex(_PATTERN_INDEX) + '))')
+_POSITIVE_COUNT = len(POSITIVE_WORDS)
+
+# Longest pattern length; matches can start at most this many characters back
+MAX_PATTERN_LENGTH = max(len(pattern) for pattern in _PATTERN_INDEX)
+
+
+def _scan(text_lower: str, start: int = 0):
+    """Collect flags and word ids of every pattern starting at or after start"""
+    flags = 0
+    words = set()
+    index = _PATTERN_INDEX
+    for match in _MATCHER.finditer(text_lower, start):
+        pattern_flags, pattern_words = index[match.group(1)]
+        flags |= pattern_flags
+        words |= pattern_words
+        if flags & _STRONG_NEGATIVE:
+            # Nothing outranks a strong negative phrase
+            break
+    return flags, words
+
+
+def _classify(text_lower: str, flags: int, words) -> str:
+    """Apply the priority rules to the patterns found in a transcript"""
+    if flags & _STRONG_NEGATIVE:
+        return "NEGATIVE"
+    if flags & _STRONG_POSITIVE:
+        return "POSITIVE"
+    if flags & _NEGATED_POSITIVE:
+        return "NEGATIVE"
+
+    # Default to NEUTRAL for very short messages or greetings
+    stripped = text_lower.strip()
+    if len(stripped) < 5 or stripped in GREETINGS:
+        return "NEUTRAL"
+
+    positive_count = sum(1 for word in words if word < _POSITIVE_COUNT)
+    negative_count = len(words) - positive_count
+
+    if positive_count > negative_count:
+        return "POSITIVE"
+    elif negative_count > positive_count:
+        return "NEGATIVE"
+    else:
+        return "NEUTRAL"
+
+
+def analyze_sentiment(text: str) -> str:
+    """Enhanced sentiment analysis based on keywords and phrases with negation handling"""
+    text_lower = text.lower()
+    flags, words = _scan(text_lower)
+    return _classify(text_lower, flags, words)
+
+
+def analyze_sentiment_batch(texts: Iterable[str]) -> List[str]:
+    """Score many transcripts with a single scan over their concatenation"""
+    lowered = [text.lower() for text in texts]
+    if not lowered:
+        return []
+
+    # No pattern contains NUL, so matches never cross from one text into the next
+    joined = '\x00'.join(lowered)
+    ends = []
+    offset = 0
+    for text_lower in lowered:
+        offset += len(text_lower)
+        ends.append(offset)
+        offset += 1
+
+    flags = [0] * len(lowered)
+    words = [set() for _ in lowered]
+    index = _PATTERN_INDEX
+    search = _MATCHER.search
+    i = 0
+    pos = 0
+    while True:
+        match = search(joined, pos)
+        if match is None:
+            break
+        start = match.start()
+        if start > ends[i]:
+            i = bisect_right(ends, start, i)
+        pattern_flags, pattern_words = index[match.group(1)]
+        flags[i] |= pattern_flags
+        words[i] |= pattern_words
+        # A strong negative decides this text; resume at the next one
+        pos = ends[i] + 1 if flags[i] & _STRONG_NEGATIVE else start + 1
+
+    return [_classify(text_lower, flags[i], words[i]) for i, text_lower in enumerate(lowered)]
+
+
+class StreamingSentiment:
+    """Sentiment of a transcript fed in fragments, kept up to date without rescanning"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self._text = ''
+        self._flags = 0
+        self._words = set()
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, fragment: str) -> str:
+        """Add the next fragment and return the sentiment of everything so far"""
+        if fragment:
+            previous_length = len(self._text)
+            self._text += fragment.lower()
+            if not self._flags & _STRONG_NEGATIVE:
+                # Patterns starting further back lay entirely inside the text
+                # already scanned; closer ones may continue into the fragment
+                start = max(0, previous_length - MAX_PATTERN_LENGTH + 1)
+                flags, words = _scan(self._text, start)
+                self._flags |= flags
+                self._words |= words
+        return self.sentiment
+
+    @property
+    def sentiment(self) -> str:
+        return _classify(self._text, self._flags, self._words)
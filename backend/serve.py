@@ -0,0 +1,102 @@
+"""Production entry point: multi-process serving with graceful drain.
+
+    python serve.py
+
+Runs main:app in WEB_CONCURRENCY worker processes (default: one per CPU)
+sharing one listening socket, so realtime sessions are spread across cores.
+On SIGTERM or Ctrl+C each worker drains instead of exiting right away: it
+stops accepting connections, turns away new sessions, lets open
+conversations finish their current turn (main.py closes them once they are
+quiet), and exits when none are left or DRAIN_TIMEOUT seconds have passed.
+A second Ctrl+C skips the drain. SIGHUP to the parent drains and restarts
+the workers one at a time.
+
+Environment variables:
+    HOST, PORT          listen address (default 0.0.0.0:2179)
+    WEB_CONCURRENCY     worker processes (default: CPU count)
+    DRAIN_TIMEOUT       longest a worker waits for sessions to end (default 300)
+
+Per-worker session limits and idle reaping are configured in main.py with
+MAX_SESSIONS_PER_WORKER and SESSION_IDLE_TIMEOUT; LIVE_POOL_SIZE is split
+between the workers.
+
+With more than one worker, each publishes its metrics to a shared directory
+(METRICS_MULTIPROC_DIR, a fresh temporary directory by default) so /metrics
+reports the whole server whichever worker answers it.
+"""
+import logging
+import os
+import signal
+import tempfile
+import time
+
+import uvicorn
+from dotenv import load_dotenv
+from uvicorn.supervisors import Multiprocess
+
+from admission import gate
+from metrics import clear_snapshots
+
+logger = logging.getLogger("ellen.serve")
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that lets realtime sessions finish before it exits"""
+
+    def __init__(self, config: uvicorn.Config, drain_timeout: float):
+        super().__init__(config)
+        self.drain_timeout = drain_timeout
+        self.draining_since = None
+
+    def handle_exit(self, sig, frame) -> None:
+        if self.draining_since is None:
+            self.draining_since = time.monotonic()
+            gate.drain()
+        elif sig == signal.SIGINT:
+            # A second Ctrl+C means now; further SIGTERMs (e.g. from the
+            # supervisor after the process group got SIGINT) keep draining
+            super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.draining_since is not None and not self.should_exit:
+            if self.servers and self.servers[0].is_serving():
+                logger.warning("Draining %d realtime session(s)", gate.active)
+                for server in self.servers:
+                    server.close()
+            if gate.active <= 0:
+                self.should_exit = True
+            elif time.monotonic() - self.draining_since > self.drain_timeout:
+                logger.warning("Drain timeout reached with %d session(s) open", gate.active)
+                self.should_exit = True
+        return await super().on_tick(counter)
+
+
+def main():
+    load_dotenv()
+    workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+    # Inherited by the workers: main.py divides the Live session pool between them
+    # and merges their metrics through the snapshot directory
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if workers > 1:
+        metrics_dir = os.getenv("METRICS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="ellen-metrics-")
+        os.makedirs(metrics_dir, exist_ok=True)
+        clear_snapshots(metrics_dir)
+        os.environ["METRICS_MULTIPROC_DIR"] = metrics_dir
+    config = uvicorn.Config(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "2179")),
+        workers=workers,
+        # Connections still open once the drain is over get this long to close
+        timeout_graceful_shutdown=5,
+    )
+    server = DrainingServer(config, drain_timeout=float(os.getenv("DRAIN_TIMEOUT", "300")))
+    if config.workers > 1:
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+types = pytest.importorskip("google.genai.types")
+
+from live_link import LiveLink, UpstreamLost  # noqa: E402
+
+DROP = object()
+
+
+class ScriptedSession:
+    """Live session whose receive() plays queued messages; DROP raises like a dropped socket"""
+
+    def __init__(self):
+        self.sent = []
+        self.messages = asyncio.Queue()
+        self.dropped = False
+
+    async def send_realtime_input(self, **kwargs):
+        if self.dropped:
+            raise ConnectionError("dropped")
+        self.sent.append(kwargs)
+
+    async def receive(self):
+        while True:
+            message = await self.messages.get()
+            if message is DROP:
+                self.dropped = True
+                raise ConnectionError("dropped")
+            yield message
+            if message.server_content and message.server_content.turn_complete:
+                return
+
+
+class Upstream:
+    """Hands out ScriptedSessions and records the handles they resumed"""
+
+    def __init__(self, failures=0, drop_at_once=False):
+        self.sessions = []
+        self.drop_at_once = drop_at_once
+        self.handles = []
+        self.failures = failures
+
+    @asynccontextmanager
+    async def connect(self, handle=None):
+        self.handles.append(handle)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("refused")
+        session = ScriptedSession()
+        if self.drop_at_once:
+            session.messages.put_nowait(DROP)
+        self.sessions.append(session)
+        yield session
+
+    def link(self, **kwargs):
+        return LiveLink(self.connect(), self.connect, **kwargs)
+
+
+def audio(byte, size=100):
+    return types.Blob(mime_type="audio/pcm", data=bytes([byte]) * size)
+
+
+def handle(name, last_consumed=None):
+    return types.LiveServerMessage(session_resumption_update=types.LiveServerSessionResumptionUpdate(
+        new_handle=name, resumable=True, last_consumed_client_message_index=last_consumed
+    ))
+
+
+def content(**kwargs):
+    return types.LiveServerMessage(server_content=types.LiveServerContent(**kwargs))
+
+
+def model_audio():
+    return content(model_turn=types.Content(parts=[types.Part(inline_data=audio(0))]))
+
+
+def sent_bytes(session):
+    return [kwargs["audio"].data[0] for kwargs in session.sent]
+
+
+async def receive_until_blocked(link, received):
+    async def loop():
+        while True:
+            async for message in link.receive():
+                received.append(message)
+    task = asyncio.create_task(loop())
+    await asyncio.sleep(0.05)
+    return task
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(LiveLink, "RETRY_DELAY", 0.001)
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, 5))
+
+
+def test_resume_replays_only_input_after_the_handle():
+    async def scenario():
+        upstream = Upstream()
+        async with upstream.link() as link:
+            first = upstream.sessions[0]
+            await link.send_realtime_input(audio=audio(1))
+            first.messages.put_nowait(handle("h1"))
+            received = []
+            task = await receive_until_blocked(link, received)
+            await link.send_realtime_input(audio=audio(2))
+            first.messages.put_nowait(DROP)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            return upstream, link
+
+    upstream, link = run(scenario())
+    assert upstream.handles == [None, "h1"]
+    assert sent_bytes(upstream.sessions[1]) == [2]
+    assert link.reconnects == 1 and link.replayed_bytes == 100
+
+
+def test_input_the_model_answered_is_not_replayed():
+    async def scenario():
+        upstream = Upstream()
+        async with upstream.link() as link:
+            first = upstream.sessions[0]
+            first.messages.put_nowait(handle("h1"))
+            received = []
+            task = await receive_until_blocked(link, received)
+            await link.send_realtime_input(audio=audio(1))  # the utterance
+            first.messages.put_nowait(model_audio())  # the model starts answering it
+            await asyncio.sleep(0.01)
+            await link.send_realtime_input(audio=audio(2))  # the user talks over the answer
+            first.messages.put_nowait(DROP)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            return upstream, received
+
+    upstream, received = run(scenario())
+    assert sent_bytes(upstream.sessions[1]) == [2]
+    # The answer cut short by the drop is closed for the caller
+    assert received[-1].server_content.turn_complete
+
+
+def test_transparent_resumption_replays_what_was_not_consumed():
+    async def scenario():
+        upstream = Upstream()
+        async with upstream.link(transparent=True) as link:
+            first = upstream.sessions[0]
+            for byte in (1, 2, 3):
+                await link.send_realtime_input(audio=audio(byte))
+            first.messages.put_nowait(model_audio())
+            first.messages.put_nowait(handle("h1", last_consumed=0))
+            received = []
+            task = await receive_until_blocked(link, received)
+            first.messages.put_nowait(DROP)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            return upstream
+
+    upstream = run(scenario())
+    assert sent_bytes(upstream.sessions[1]) == [2, 3]
+
+
+def test_replay_is_capped_at_the_limit():
+    async def scenario():
+        upstream = Upstream()
+        async with upstream.link(replay_limit=250) as link:
+            for byte in (1, 2, 3, 4):
+                await link.send_realtime_input(audio=audio(byte))
+            upstream.sessions[0].dropped = True
+            await link.send_realtime_input(audio=audio(5))
+            return upstream
+
+    upstream = run(scenario())
+    assert sent_bytes(upstream.sessions[1]) == [4, 5]
+
+
+def test_gives_up_after_failed_reconnects():
+    async def scenario():
+        upstream = Upstream()
+        async with upstream.link() as link:
+            upstream.failures = LiveLink.RECONNECT_ATTEMPTS
+            upstream.sessions[0].dropped = True
+            with pytest.raises(UpstreamLost):
+                await link.send_realtime_input(audio=audio(1))
+            attempts = len(upstream.handles)
+            # Later sends fail fast instead of reconnecting again
+            with pytest.raises(UpstreamLost):
+                await link.send_realtime_input(audio=audio(2))
+            assert link.failed and len(upstream.handles) == attempts
+            with pytest.raises(UpstreamLost):
+                async for _ in link.receive():
+                    pass
+
+    run(scenario())
+
+
+def test_gives_up_when_the_upstream_keeps_dropping():
+    async def scenario():
+        upstream = Upstream(drop_at_once=True)
+        async with upstream.link() as link:
+            with pytest.raises(UpstreamLost):
+                async for _ in link.receive():
+                    pass
+            assert len(upstream.sessions) == LiveLink.RECONNECT_ATTEMPTS + 1
+
+    run(scenario())
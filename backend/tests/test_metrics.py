@@ -0,0 +1,55 @@
+import os
+
+from metrics import Counter, Registry, SessionMetrics, clear_snapshots
+
+
+def test_turn_records_are_capped_but_counted():
+    session = SessionMetrics()
+    for _ in range(SessionMetrics.MAX_TURNS + 5):
+        session.turn_complete()
+    assert len(session.turns) == SessionMetrics.MAX_TURNS
+    assert session.summary()["turns"] == SessionMetrics.MAX_TURNS + 5
+
+
+def test_flush_is_booked_to_the_open_turn():
+    session = SessionMetrics()
+    session.flushed("threshold", 1000)
+    record = session.turn_complete()
+    assert (record["flushes"], record["audio_bytes_out"]) == (1, 1000)
+    assert session.turn["audio_bytes_out"] == 0
+
+
+def test_response_latency_from_end_of_speech():
+    session = SessionMetrics()
+    session.first_model_audio()  # no speech end yet
+    session.speech_ended()
+    session.first_model_audio()
+    assert session.turn_complete()["response_latency"] >= 0
+
+
+def test_render_merges_worker_snapshots(tmp_path):
+    registry = Registry()
+    registry.multiprocess_dir = str(tmp_path)
+    counter = registry.register(Counter("things_total", "Things", ["kind"]))
+    gauge = registry.gauge("open_things", "Open things")
+    counter.labels(kind="a").inc(2)
+    gauge.set(3)
+    snapshot = registry.snapshot()
+
+    # Another live worker (our parent) and one that has exited
+    text = registry.render([(os.getppid(), snapshot), (2 ** 22 + 1, snapshot)])
+    assert 'things_total{kind="a"} 6' in text
+    assert f'open_things{{worker="{os.getpid()}"}} 3' in text
+    assert f'open_things{{worker="{os.getppid()}"}} 3' in text
+    assert f'worker="{2 ** 22 + 1}"' not in text
+
+
+def test_snapshots_are_shared_through_the_directory(tmp_path):
+    registry = Registry()
+    registry.multiprocess_dir = str(tmp_path)
+    registry.counter("things_total", "Things").inc()
+    registry.write_snapshot(registry.snapshot())
+    # A worker doesn't read its own snapshot back
+    assert registry.read_snapshots() == []
+    clear_snapshots(str(tmp_path))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from protocol import (  # noqa: E402
+    FRAME_HEADER,
+    KIND_INPUT_AUDIO,
+    KIND_OUTPUT_AUDIO,
+    ProtocolError,
+    SessionOptions,
+    pack_frame,
+    unpack_frame,
+)
+
+
+def test_frame_round_trip():
+    kind, seq, payload = unpack_frame(pack_frame(KIND_OUTPUT_AUDIO, 42, b"\x01\x02\x03"))
+    assert (kind, seq, bytes(payload)) == (KIND_OUTPUT_AUDIO, 42, b"\x01\x02\x03")
+
+
+def test_sequence_number_wraps():
+    _, seq, _ = unpack_frame(pack_frame(KIND_INPUT_AUDIO, 2 ** 32 + 5, b""))
+    assert seq == 5
+
+
+def test_short_frame():
+    with pytest.raises(ProtocolError):
+        unpack_frame(b"\x01\x01")
+
+
+def test_unknown_version():
+    with pytest.raises(ProtocolError):
+        unpack_frame(FRAME_HEADER.pack(2, KIND_INPUT_AUDIO, 1))
+
+
+def test_bad_update_changes_nothing():
+    options = SessionOptions()
+    with pytest.raises(ProtocolError):
+        options.apply_update({"audio_transport": "binary", "output_frame_samples": 10})
+    assert options == SessionOptions()
+
+
+def test_update_applies():
+    options = SessionOptions()
+    options.apply_update({"audio_transport": "binary", "vad_mode": "drop", "output_audio_format": "ima_adpcm"})
+    assert (options.audio_transport, options.vad_mode, options.output_audio_format) == ("binary", "drop", "ima_adpcm")
+
+
+def test_bool_is_not_an_integer():
+    with pytest.raises(ProtocolError):
+        SessionOptions().apply_update({"vad_hangover_ms": True})
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from upstream import UpstreamAudioQueue
+
+
+async def drain(queue):
+    queue.close()
+    frames = []
+    while (frame := await queue.get()) is not None:
+        frames.append(frame)
+    return frames
+
+
+def test_small_chunks_are_coalesced():
+    async def run():
+        queue = UpstreamAudioQueue(frame_bytes=100, max_bytes=1000)
+        for _ in range(5):
+            await queue.put(b"a" * 40)
+        return await drain(queue)
+
+    assert [len(frame) for frame in asyncio.run(run())] == [120, 80]
+
+
+def test_partial_frame_is_sent_after_max_delay():
+    async def run():
+        queue = UpstreamAudioQueue(frame_bytes=100, max_bytes=1000, max_delay=0.01)
+        await queue.put(b"a" * 10)
+        return await asyncio.wait_for(queue.get(), 1)
+
+    assert asyncio.run(run()) == b"a" * 10
+
+
+def test_drop_oldest_keeps_latest_audio():
+    dropped = []
+
+    async def run():
+        queue = UpstreamAudioQueue(frame_bytes=100, max_bytes=300, on_drop=dropped.append)
+        for byte in b"abcde":
+            await queue.put(bytes([byte]) * 100)
+        return await drain(queue)
+
+    assert asyncio.run(run()) == [b"c" * 100, b"d" * 100, b"e" * 100]
+    assert dropped == [100, 100]
+
+
+def test_drop_newest_keeps_earliest_audio():
+    async def run():
+        queue = UpstreamAudioQueue(frame_bytes=100, max_bytes=300, policy="drop_newest")
+        for byte in b"abcde":
+            await queue.put(bytes([byte]) * 100)
+        return await drain(queue), queue.dropped_bytes
+
+    frames, dropped = asyncio.run(run())
+    assert frames == [b"a" * 100, b"b" * 100, b"c" * 100]
+    assert dropped == 200
+
+
+def test_block_waits_for_space():
+    async def run():
+        queue = UpstreamAudioQueue(frame_bytes=100, max_bytes=200, policy="block")
+        await queue.put(b"a" * 100)
+        await queue.put(b"b" * 100)
+        writer = asyncio.create_task(queue.put(b"c" * 100))
+        await asyncio.sleep(0.01)
+        assert not writer.done()
+        assert await queue.get() == b"a" * 100
+        await asyncio.wait_for(writer, 1)
+        return await drain(queue), queue.dropped_bytes
+
+    assert asyncio.run(run()) == ([b"b" * 100, b"c" * 100], 0)
+
+
+def test_end_of_stream_marker_survives_drops():
+    async def run():
+        queue = UpstreamAudioQueue(frame_bytes=100, max_bytes=200)
+        await queue.put(b"a" * 100)
+        queue.end_stream()
+        await queue.put(b"b" * 100)
+        await queue.put(b"c" * 100)
+        return await drain(queue)
+
+    assert asyncio.run(run()) == [b"", b"b" * 100, b"c" * 100]
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        UpstreamAudioQueue(frame_bytes=100, max_bytes=100, policy="spill")
@@ -0,0 +1,60 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vad import BYTES_PER_MS, SAMPLE_RATE, VoiceActivityDetector  # noqa: E402
+
+CHUNK_MS = 20
+
+
+def speech(ms=CHUNK_MS):
+    t = np.arange(SAMPLE_RATE * ms // 1000)
+    return (6000 * np.sin(2 * np.pi * 150 * t / SAMPLE_RATE)).astype("<i2").tobytes()
+
+
+def silence(ms=CHUNK_MS):
+    return bytes(ms * BYTES_PER_MS)
+
+
+def feed(vad, chunks):
+    forwarded, ended = [], []
+    for chunk in chunks:
+        out, stream_ended = vad.process(chunk)
+        forwarded.append(b"".join(out))
+        ended.append(stream_ended)
+    return forwarded, ended
+
+
+def test_off_forwards_everything():
+    vad = VoiceActivityDetector("off")
+    forwarded, ended = feed(vad, [silence(), speech()])
+    assert forwarded == [silence(), speech()]
+    assert not any(ended)
+
+
+def test_drop_sends_preroll_with_the_onset():
+    vad = VoiceActivityDetector("drop", preroll_ms=40, hangover_ms=0)
+    forwarded, _ = feed(vad, [silence()] * 5 + [speech()])
+    assert forwarded[:5] == [b""] * 5
+    assert forwarded[5] == silence() * 2 + speech()
+    assert vad.suppressed_bytes == len(silence()) * 3
+
+
+def test_drop_keeps_hangover_then_ends_the_stream():
+    vad = VoiceActivityDetector("drop", preroll_ms=0, hangover_ms=40)
+    forwarded, ended = feed(vad, [speech()] + [silence()] * 4)
+    assert forwarded == [speech(), silence(), silence(), b"", b""]
+    assert ended == [False, False, False, True, False]
+    assert not vad.in_speech
+
+
+def test_thin_keeps_one_chunk_per_interval():
+    vad = VoiceActivityDetector("thin", preroll_ms=0)
+    forwarded, ended = feed(vad, [silence()] * 100)  # two seconds
+    assert sum(1 for chunk in forwarded if chunk) == 2
+    assert not any(ended)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        VoiceActivityDetector("loud")
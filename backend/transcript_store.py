@@ -0,0 +1,253 @@
+"""Write-behind store for conversation transcripts.
+
+Each completed turn of a /ws/realtime conversation (user and AI transcripts,
+sentiment, timings) is recorded in memory and queued for persistence; the
+audio loop never waits for disk. A background task appends queued turns to
+a JSON Lines file in batches, writing from a worker thread, and rotates the
+file once it passes `max_bytes`. Recent history is served from memory, or
+from the newest `history_files` files for conversations this process no
+longer holds (for example ones served by another worker); one such scan
+runs at a time, so requests for unknown ids cannot pile up disk reads.
+
+Memory stays bounded: each conversation keeps its last `ring_turns` turns,
+finished conversations are forgotten `max_sessions` at a time (oldest
+first), and if the disk falls behind, at most `max_pending` turns wait to be
+written before the oldest are dropped.
+
+Every worker process appends to its own file, transcripts-<pid>.jsonl, in
+the store's directory, and leaves it in place when it exits. A rotated file
+is renamed with a timestamp; so is the file of a worker that has exited,
+once another worker starts, without counting as a rotation. Old files are
+kept up to `max_files` times `max_bytes` in total, whatever the number of
+workers or restarts, and the oldest are removed beyond that.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import List, Optional
+
+from metrics import pid_alive
+
+logger = logging.getLogger("ellen.transcripts")
+
+FILE_PREFIX = "transcripts-"
+FILE_SUFFIX = ".jsonl"
+
+
+class TranscriptStore:
+    """Per-conversation turn rings in memory, flushed to disk in batches"""
+
+    def __init__(self, directory: str = "", ring_turns: int = 50, max_sessions: int = 1000,
+                 flush_interval: float = 1.0, batch_turns: int = 200, max_pending: int = 10000,
+                 max_bytes: int = 10 * 1024 * 1024, max_files: int = 10, history_files: int = 3):
+        # An empty directory keeps transcripts in memory only
+        self.directory = directory
+        self.ring_turns = ring_turns
+        self.max_sessions = max_sessions
+        self.flush_interval = flush_interval
+        self.batch_turns = batch_turns
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.history_files = history_files
+
+        self._rings = {}  # session id -> deque of turns, for open conversations
+        self._finished = OrderedDict()  # the same for finished ones, oldest first
+        self._pending = deque()
+        self._wakeup = None
+        self._flush_task = None
+        self._path = None
+        self._scan_lock = asyncio.Lock()
+
+        # Metrics
+        self.turns_recorded = 0
+        self.turns_written = 0
+        self.turns_dropped = 0
+        self.write_failures = 0
+        self.rotations = 0
+
+    def stats(self) -> dict:
+        """Snapshot of what has been recorded, written and dropped"""
+        return {
+            "sessions": len(self._rings) + len(self._finished),
+            "pending_turns": len(self._pending),
+            "turns_recorded": self.turns_recorded,
+            "turns_written": self.turns_written,
+            "turns_dropped": self.turns_dropped,
+            "write_failures": self.write_failures,
+            "rotations": self.rotations,
+        }
+
+    async def start(self) -> None:
+        """Start the background flusher, if transcripts are persisted"""
+        if self.directory and self._flush_task is None:
+            await asyncio.to_thread(os.makedirs, self.directory, exist_ok=True)
+            self._path = os.path.join(self.directory, f"{FILE_PREFIX}{os.getpid()}{FILE_SUFFIX}")
+            await asyncio.to_thread(self._retire_exited)
+            self._wakeup = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Stop the flusher after writing everything still queued"""
+        if self._flush_task is None:
+            return
+        self._flush_task.cancel()
+        try:
+            await self._flush_task
+        except asyncio.CancelledError:
+            pass
+        self._flush_task = None
+        while self._pending:
+            if not await self._flush_batch():
+                break
+
+    def record(self, session_id: str, turn: dict) -> None:
+        """Add a completed turn to the conversation's history and the write queue"""
+        ring = self._rings.get(session_id)
+        if ring is None:
+            ring = self._rings[session_id] = deque(maxlen=self.ring_turns)
+        ring.append(turn)
+        self.turns_recorded += 1
+
+        if self._flush_task is None:
+            return
+        self._pending.append({"session_id": session_id, **turn})
+        if len(self._pending) > self.max_pending:
+            self._pending.popleft()
+            self.turns_dropped += 1
+            if self.turns_dropped == 1 or self.turns_dropped % 1000 == 0:
+                logger.warning("Transcript writes falling behind; %d turn(s) dropped", self.turns_dropped)
+        if len(self._pending) >= self.batch_turns:
+            self._wakeup.set()
+
+    def end_session(self, session_id: str) -> None:
+        """Keep a finished conversation's history until newer ones push it out"""
+        ring = self._rings.pop(session_id, None)
+        if not ring:
+            return
+        self._finished[session_id] = ring
+        while len(self._finished) > self.max_sessions:
+            self._finished.popitem(last=False)
+
+    async def history(self, session_id: str, limit: int = 20) -> Optional[List[dict]]:
+        """Last `limit` turns of a conversation, oldest first; None if it is unknown"""
+        ring = self._rings.get(session_id)
+        if ring is None:
+            ring = self._finished.get(session_id)
+        if ring is not None:
+            return list(ring)[-limit:] if limit > 0 else []
+        if not self.directory or self.history_files <= 0:
+            return None
+        async with self._scan_lock:
+            return await asyncio.to_thread(self._read_history, session_id, limit)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                if not await self._flush_batch():
+                    break
+
+    async def _flush_batch(self) -> bool:
+        """Write up to `batch_turns` queued turns; on failure they are requeued"""
+        batch = [self._pending.popleft() for _ in range(min(self.batch_turns, len(self._pending)))]
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            self.write_failures += 1
+            logger.warning("Failed to write %d transcript turn(s): %s", len(batch), e)
+            self._pending.extendleft(reversed(batch))
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.turns_dropped += 1
+            return False
+        self.turns_written += len(batch)
+        return True
+
+    def _write(self, batch: List[dict]) -> None:
+        data = "".join(json.dumps(turn, ensure_ascii=False) + "\n" for turn in batch)
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.write(data)
+            size = f.tell()
+        if size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        """Rename the current file with a timestamp and prune the oldest rotated ones"""
+        if not os.path.exists(self._path) or os.path.getsize(self._path) == 0:
+            return
+        stem = self._path[:-len(FILE_SUFFIX)]
+        os.replace(self._path, f"{stem}-{time.time_ns()}{FILE_SUFFIX}")
+        self.rotations += 1
+        self._prune()
+
+    def _retire_exited(self) -> None:
+        """Rename the files of workers that have exited as if rotated, then prune"""
+        pattern = os.path.join(self.directory, f"{FILE_PREFIX}*{FILE_SUFFIX}")
+        for path in glob.glob(pattern):
+            pid = os.path.basename(path)[len(FILE_PREFIX):-len(FILE_SUFFIX)]
+            if not pid.isdigit() or path == self._path or pid_alive(int(pid)):
+                continue  # rotated already, or still being written
+            try:
+                # Named by when it was last written, so it is pruned in age order
+                os.replace(path, f"{path[:-len(FILE_SUFFIX)]}-{os.stat(path).st_mtime_ns}{FILE_SUFFIX}")
+            except OSError:
+                pass  # another worker retired it first
+        self._prune()
+
+    def _prune(self) -> None:
+        """Remove the oldest rotated files once newer ones add up to `max_files` * `max_bytes`"""
+        rotated = sorted(
+            glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*-*{FILE_SUFFIX}")),
+            key=lambda path: int(path[:-len(FILE_SUFFIX)].rsplit("-", 1)[1]),
+            reverse=True
+        )
+        budget = self.max_files * self.max_bytes if self.max_files > 0 else 0
+        kept = 0
+        for path in rotated:
+            if kept < budget:
+                try:
+                    kept += os.path.getsize(path)
+                except OSError:
+                    pass  # removed by another worker
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning("Could not remove old transcript file %s: %s", path, e)
+
+    def _read_history(self, session_id: str, limit: int) -> Optional[List[dict]]:
+        """Scan the newest transcript files, newest first, for a conversation's last turns"""
+        paths = glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*{FILE_SUFFIX}"))
+        paths.sort(key=_mtime, reverse=True)
+        del paths[self.history_files:]
+        needle = json.dumps(session_id)
+        turns = []
+        for path in paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    found = [json.loads(line) for line in f if needle in line]
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read transcript file %s: %s", path, e)
+                continue
+            turns[:0] = [turn for turn in found if turn.pop("session_id", None) == session_id]
+            if len(turns) >= limit:
+                break
+        if not turns:
+            return None
+        return turns[-limit:] if limit > 0 else []
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0  # rotated away since it was listed
@@ -0,0 +1,147 @@
+"""Bounded, coalescing queue for mic audio on its way to Gemini.
+
+The client reader puts audio in as it arrives and a separate sender task takes
+frames out, so a slow upstream never stalls reading from the client socket.
+Small chunks are coalesced until at least one frame duration of audio is
+pending; larger chunks are sent whole rather than split. When the queue holds
+more than its limit, the overflow policy decides what gives:
+
+    drop_oldest  discard the oldest queued frames (default; keeps latency low)
+    drop_newest  discard the incoming audio
+    block        make the reader wait, pushing backpressure onto the client
+
+end_stream() queues an empty frame after the audio so far, telling the sender
+to signal the end of the audio stream (used when server-side VAD stops
+forwarding silence).
+"""
+import asyncio
+from collections import deque
+from typing import Callable, Optional
+
+POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class UpstreamAudioQueue:
+    """Coalesces PCM16 chunks into frames and buffers up to max_bytes of them"""
+
+    def __init__(self, frame_bytes: int, max_bytes: int, policy: str = "drop_oldest",
+                 max_delay: float = 0.1, on_drop: Optional[Callable[[int], None]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown upstream queue policy: {policy!r}")
+        self.frame_bytes = frame_bytes
+        self.max_bytes = max(max_bytes, frame_bytes)
+        self.policy = policy
+        # Longest a partial frame waits for more audio before it is sent anyway
+        self.max_delay = max_delay
+        self._on_drop = on_drop
+
+        self._frames = deque()
+        self._pending = bytearray()
+        self._queued_bytes = 0
+        self._closed = False
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+
+        # Statistics
+        self.dropped_bytes = 0
+        self.max_depth_bytes = 0
+        self.frames_sent = 0
+
+    @property
+    def depth_bytes(self) -> int:
+        """Audio waiting to be sent, including the partial frame"""
+        return self._queued_bytes + len(self._pending)
+
+    async def put(self, data: bytes) -> None:
+        """Queue a chunk of audio, applying the overflow policy"""
+        if self._closed:
+            return
+        if self.depth_bytes + len(data) > self.max_bytes:
+            if self.policy == "drop_newest":
+                self._drop(len(data))
+                return
+            if self.policy == "block":
+                # An empty queue always takes the chunk, however large
+                while not self._closed and self.depth_bytes and self.depth_bytes + len(data) > self.max_bytes:
+                    self._space.clear()
+                    await self._space.wait()
+                if self._closed:
+                    return
+
+        started_partial = not self._pending
+        self._pending += data
+        if len(self._pending) >= self.frame_bytes:
+            self._push_pending()
+        elif started_partial:
+            # Wake the sender so it starts the max_delay clock for this partial frame
+            self._ready.set()
+
+        if self.policy == "drop_oldest":
+            stream_ended = False
+            while self._frames and self.depth_bytes > self.max_bytes:
+                frame = self._frames.popleft()
+                if not frame:
+                    stream_ended = True
+                    continue
+                self._queued_bytes -= len(frame)
+                self._drop(len(frame))
+            if stream_ended:
+                # Keep the end-of-stream marker even when the audio before it is dropped
+                self._frames.appendleft(b"")
+
+        self.max_depth_bytes = max(self.max_depth_bytes, self.depth_bytes)
+
+    def flush(self) -> None:
+        """Make a partial frame available right away (e.g. at the end of speech)"""
+        if self._pending:
+            self._push_pending()
+
+    def end_stream(self) -> None:
+        """Send what is pending, then an end-of-stream marker"""
+        if self._closed:
+            return
+        self.flush()
+        self._frames.append(b"")
+        self._ready.set()
+
+    def close(self) -> None:
+        """Stop accepting audio; get() drains what is left, then returns None"""
+        self._closed = True
+        self._ready.set()
+        self._space.set()
+
+    async def get(self) -> Optional[bytes]:
+        """Next frame to send, b"" at the end of an audio stream, or None once closed and drained"""
+        while True:
+            if self._frames:
+                frame = self._frames.popleft()
+                if frame:
+                    self._queued_bytes -= len(frame)
+                    self.frames_sent += 1
+                    self._space.set()
+                return frame
+            if self._closed:
+                if self._pending:
+                    self._push_pending()
+                    continue
+                return None
+
+            # Wait for a full frame; a partial one goes out after max_delay
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), self.max_delay if self._pending else None)
+            except asyncio.TimeoutError:
+                self.flush()
+
+    def _push_pending(self) -> None:
+        frame = bytes(self._pending)
+        self._pending.clear()
+        self._frames.append(frame)
+        self._queued_bytes += len(frame)
+        self._ready.set()
+
+    def _drop(self, size: int) -> None:
+        self.dropped_bytes += size
+        if self._on_drop is not None:
+            self._on_drop(size)
@@ -0,0 +1,136 @@
+"""Server-side voice activity detection for mic audio on its way to Gemini.
+
+Browsers stream the microphone continuously, so most of what reaches the
+backend between turns is silence. VoiceActivityDetector classifies each
+incoming 16kHz PCM16 chunk from the energy and zero-crossing rate of its 10ms
+windows (vectorized with NumPy) and decides what is forwarded:
+
+    off   forward everything (default)
+    drop  forward speech only, then end the audio stream so Gemini's own
+          VAD still sees the end of the utterance
+    thin  like drop, but keep one chunk per THIN_INTERVAL_MS of silence
+          instead of ending the stream
+
+Speech is forwarded together with up to `preroll_ms` of the audio that came
+just before it, so onsets are not clipped, and keeps being forwarded for
+`hangover_ms` after the last speech chunk, so word endings and short pauses
+are not either.
+"""
+from collections import deque
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+WINDOW_SAMPLES = 160  # 10ms analysis windows
+
+VAD_MODES = ("off", "drop", "thin")
+
+# Voiced speech crosses zero far less often than hiss and fan noise; a window
+# above this rate only counts as speech when it is well above the threshold
+MAX_SPEECH_ZCR = 0.35
+LOUD_MARGIN_DB = 15.0
+# Windows that must look like speech before a chunk does (ignores clicks)
+MIN_SPEECH_WINDOWS = 2
+# In thin mode, silent audio kept to keep the stream alive
+THIN_INTERVAL_MS = 1000
+
+
+def speech_windows(pcm, threshold_db: float) -> int:
+    """Number of 10ms windows in a PCM16 chunk that look like speech"""
+    samples = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // 2)
+    if not len(samples):
+        return 0
+    windows = max(1, len(samples) // WINDOW_SAMPLES)
+    frames = samples[:windows * WINDOW_SAMPLES].reshape(windows, -1).astype(np.float32)
+
+    energy = np.mean(frames * frames, axis=1)
+    level_db = 10.0 * np.log10(energy / (32768.0 * 32768.0) + 1e-12)
+    negative = np.signbit(frames)
+    zcr = np.mean(negative[:, 1:] != negative[:, :-1], axis=1)
+
+    speech = (level_db > threshold_db) & ((zcr < MAX_SPEECH_ZCR) | (level_db > threshold_db + LOUD_MARGIN_DB))
+    return int(np.count_nonzero(speech))
+
+
+class VoiceActivityDetector:
+    """Decides which mic chunks are forwarded upstream"""
+
+    def __init__(self, mode: str = "off", threshold_db: float = -45.0,
+                 hangover_ms: int = 400, preroll_ms: int = 200):
+        self._preroll = deque()
+        self._preroll_bytes = 0
+        self.in_speech = False
+        self._silence_ms = 0.0  # silence since the last speech chunk
+        self._since_kept_ms = 0.0  # silence since the last chunk kept in thin mode
+
+        # Statistics
+        self.total_bytes = 0
+        self.forwarded_bytes = 0
+        self.suppressed_bytes = 0  # pre-roll still held counts as neither
+
+        self.configure(mode, threshold_db, hangover_ms, preroll_ms)
+
+    def configure(self, mode: str, threshold_db: float, hangover_ms: int, preroll_ms: int) -> None:
+        if mode not in VAD_MODES:
+            raise ValueError(f"Unknown VAD mode: {mode!r}")
+        self.mode = mode
+        self.threshold_db = threshold_db
+        self.hangover_ms = hangover_ms
+        # Turning the VAD off discards any held pre-roll
+        self.preroll_bytes = preroll_ms * BYTES_PER_MS if mode != "off" else 0
+        self._trim_preroll()
+
+    @property
+    def suppressed_fraction(self) -> float:
+        return self.suppressed_bytes / self.total_bytes if self.total_bytes else 0.0
+
+    def process(self, pcm):
+        """Classify a chunk; returns (chunks to forward, whether the stream just ended)"""
+        self.total_bytes += len(pcm)
+        if self.mode == "off":
+            self.forwarded_bytes += len(pcm)
+            return [pcm], False
+
+        windows = max(1, len(pcm) // (WINDOW_SAMPLES * 2))
+        if speech_windows(pcm, self.threshold_db) >= min(MIN_SPEECH_WINDOWS, windows):
+            forward = list(self._preroll)
+            forward.append(pcm)
+            self.forwarded_bytes += self._preroll_bytes + len(pcm)
+            self._preroll.clear()
+            self._preroll_bytes = 0
+            self.in_speech = True
+            self._silence_ms = 0.0
+            return forward, False
+
+        duration_ms = len(pcm) / BYTES_PER_MS
+        if self.in_speech:
+            self._silence_ms += duration_ms
+            if self._silence_ms <= self.hangover_ms:
+                self.forwarded_bytes += len(pcm)
+                return [pcm], False
+            self.in_speech = False
+            self._since_kept_ms = 0.0
+            self._hold(pcm)
+            return [], self.mode == "drop"
+
+        if self.mode == "thin":
+            self._since_kept_ms += duration_ms
+            if self._since_kept_ms >= THIN_INTERVAL_MS:
+                self._since_kept_ms = 0.0
+                self.forwarded_bytes += len(pcm)
+                return [pcm], False
+        self._hold(pcm)
+        return [], False
+
+    def _hold(self, pcm) -> None:
+        """Keep silence as pre-roll for the next onset; what falls out is suppressed"""
+        self._preroll.append(pcm)
+        self._preroll_bytes += len(pcm)
+        self._trim_preroll()
+
+    def _trim_preroll(self) -> None:
+        while self._preroll and self._preroll_bytes > self.preroll_bytes:
+            chunk = self._preroll.popleft()
+            self._preroll_bytes -= len(chunk)
+            self.suppressed_bytes += len(chunk)